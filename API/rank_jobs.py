@@ -0,0 +1,320 @@
+# API/rank_jobs.py
+"""
+Asynchronous rank jobs.
+
+POST /rank/jobs stores the request in a SQLite job table and returns at
+once; a bounded pool of worker threads claims queued jobs and runs them
+through the same rank_service path as /rank, storing the RankResponse as
+JSON. Between graph steps a running job refreshes its heartbeat and checks
+for cancellation. Jobs whose worker died (no heartbeat for a while) are put
+back in the queue, so accepted work survives restarts. Finished jobs are
+kept for RANK_JOB_TTL seconds.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from Core.config import RANK_JOBS_DB, RANK_JOB_WORKERS, RANK_JOB_QUEUE_SIZE, RANK_JOB_TTL
+from Core.logger import get_logger, request_id_var
+from Core.ratelimit import PRIORITY_BATCH, priority
+from .rank_service import rank, RankCancelled
+from .schemas import RankRequest
+
+logger = get_logger("api.rank_jobs")
+
+# Running jobs without a heartbeat for this long are considered orphaned
+_STALE_AFTER = 120.0
+_MAINTENANCE_INTERVAL = 30.0
+
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    query TEXT NOT NULL,
+    trusted_only INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    expires_at REAL NOT NULL,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+"""
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """SQLite-backed job table (WAL, safe to share between worker processes)."""
+
+    def __init__(self, path: str = RANK_JOBS_DB, ttl: int = RANK_JOB_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if not self._ready:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            try:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(_SCHEMA)
+                    self._ready = True
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+
+    def create(self, payload: RankRequest, max_queued: int = RANK_JOB_QUEUE_SIZE) -> Dict[str, Any]:
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "query": payload.query,
+            "trusted_only": int(bool(payload.trusted_only)),
+            "created_at": now,
+            "expires_at": now + self.ttl,
+        }
+        with self._connect() as conn:
+            (queued,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            if queued >= max_queued:
+                raise JobQueueFull()
+            conn.execute(
+                "INSERT INTO jobs (id, status, query, trusted_only, created_at, expires_at) "
+                "VALUES (:id, :status, :query, :trusted_only, :created_at, :expires_at)",
+                job,
+            )
+        return self.get(job["id"]) or job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        return _job_row(row) if row else None
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, started_at = ?, heartbeat_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' AND expires_at > ? "
+                "            ORDER BY created_at LIMIT 1) "
+                "AND status = 'queued' RETURNING *",
+                (owner, now, now, now),
+            ).fetchone()
+        return _job_row(row) if row else None
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """Refresh a running job's heartbeat; True if it should stop (cancelled or lost)."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND owner = ?", (time.time(), job_id, owner)
+            )
+            row = conn.execute("SELECT owner, cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or row["owner"] != owner or bool(row["cancel_requested"])
+
+    def finish(self, job_id: str, owner: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ? "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    now,
+                    now + self.ttl,
+                    job_id,
+                    owner,
+                ),
+            )
+
+    def requeue(self, job_id: str, owner: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL, heartbeat_at = NULL "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (job_id, owner),
+            )
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job now, or flag a running one to stop at its next step."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, now + self.ttl, job_id),
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def maintain(self) -> Dict[str, int]:
+        """Requeue orphaned running jobs and drop expired ones."""
+        now = time.time()
+        with self._connect() as conn:
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL, heartbeat_at = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ? AND cancel_requested = 0",
+                (now - _STALE_AFTER,),
+            ).rowcount
+            # orphaned jobs that were asked to stop are simply cancelled
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND cancel_requested = 1",
+                (now, now + self.ttl, now - _STALE_AFTER),
+            )
+            expired = conn.execute(
+                "DELETE FROM jobs WHERE expires_at <= ? AND status != 'running'", (now,)
+            ).rowcount
+        return {"requeued": requeued, "expired": expired}
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+
+def _job_row(row: sqlite3.Row) -> Dict[str, Any]:
+    out = dict(row)
+    out["trusted_only"] = bool(out["trusted_only"])
+    out["result"] = json.loads(out["result"]) if out.get("result") else None
+    return out
+
+
+class RankJobRunner:
+    """Bounded pool of worker threads that drain the job table."""
+
+    def __init__(self, store: JobStore, workers: int = RANK_JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self.owner = uuid.uuid4().hex  # identifies this process's claims
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_maintenance = 0.0
+        self._maintenance_lock = threading.Lock()
+
+    def submit(self, payload: RankRequest) -> Dict[str, Any]:
+        job = self.store.create(payload)
+        self._wake.set()
+        return job
+
+    def _maybe_maintain(self) -> None:
+        if time.monotonic() - self._last_maintenance < _MAINTENANCE_INTERVAL:
+            return
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_maintenance = time.monotonic()
+            out = self.store.maintain()
+            if out["requeued"]:
+                logger.warning({"event": "rank_jobs.requeued", "count": out["requeued"]})
+        except Exception as e:
+            logger.warning({"event": "rank_jobs.maintenance_failed", "error": str(e)})
+        finally:
+            self._maintenance_lock.release()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            self._maybe_maintain()
+            try:
+                job = self.store.claim(self.owner)
+            except Exception as e:
+                logger.warning({"event": "rank_jobs.claim_failed", "error": str(e)})
+                job = None
+            if job is None:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        token = request_id_var.set(job_id)
+        started = time.perf_counter()
+        status = "failed"
+        try:
+            payload = RankRequest(query=job["query"], trusted_only=job["trusted_only"])
+
+            def should_stop() -> bool:
+                return self._stop.is_set() or self.store.heartbeat(job_id, self.owner)
+
+            with priority(PRIORITY_BATCH):
+                response = rank(payload, should_stop)
+            status = "succeeded"
+            self.store.finish(job_id, self.owner, status, result=jsonable_encoder(response))
+        except RankCancelled:
+            if self._stop.is_set():
+                # shutting down: hand the job back instead of dropping it
+                status = "requeued"
+                self.store.requeue(job_id, self.owner)
+            else:
+                status = "cancelled"
+                self.store.finish(job_id, self.owner, status)
+        except HTTPException as e:
+            self.store.finish(job_id, self.owner, status, error=f"{e.status_code}: {e.detail}")
+        except Exception as e:
+            self.store.finish(job_id, self.owner, status, error=str(e))
+        finally:
+            logger.info({
+                "event": "rank_jobs.done",
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+            request_id_var.reset(token)
+
+    def start(self) -> None:
+        if self.workers <= 0 or self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"rank-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop claiming; running jobs are requeued at their next step."""
+        self._stop.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(deadline - time.monotonic(), 0))
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            counts = self.store.counts()
+        except Exception:
+            counts = {}
+        return {"workers": len(self._threads), **counts}
+
+
+job_store = JobStore()
+rank_jobs = RankJobRunner(job_store)
@@ -0,0 +1,141 @@
+# API/rank_service.py
+"""
+Shared /rank execution: build the initial state, run the agent graph and
+map the final state onto RankResponse. Route handlers stay thin.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from Agent import build_app, AgentState
+from Core.logger import get_logger, should_sample_state, request_id_var, new_request_id
+from Core.profiling import profile_enabled, profile_request
+from Core.ratelimit import RateLimitExceeded
+from .schemas import RankRequest, RankResponse, RankResult, OfferItem
+
+logger = get_logger("api.rank")
+
+# Build LangGraph app once per process
+agent_app = build_app()
+
+
+def build_init_state(payload: RankRequest) -> AgentState:
+    return {
+        "query": payload.query,
+        "offers": [],
+        "missing": [],
+        "tried_tools": [],
+        "steps": 0,
+        "done": False,
+        "errors": [],
+        "trusted_only": bool(payload.trusted_only),
+    }
+
+
+class RankCancelled(Exception):
+    """Raised between graph steps when the caller asked to stop."""
+
+
+def run_agent(init_state: AgentState, should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """Run the LangGraph agent and return its final state (checking should_stop after each step)."""
+    final: Dict[str, Any] | None = None
+    try:
+        # "values" yields the merged state after each step, which also works
+        # for graphs whose nodes return partial updates (fused mode)
+        for values in agent_app.stream(init_state, stream_mode="values"):
+            final = values
+            if should_stop is not None and should_stop():
+                raise RankCancelled()
+    except RateLimitExceeded as e:
+        logger.warning({"event": "rank.shed", "upstream": e.upstream, "retry_after": e.retry_after})
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    if final is None or "result" not in final:
+        raise HTTPException(status_code=500, detail="Agent did not reach finish node.")
+    return final
+
+
+def to_offer_item(it: Dict[str, Any]) -> OfferItem:
+    """Map a raw ranked item onto OfferItem, defaulting missing fields."""
+    return OfferItem(
+        name=str(it.get("name", "")),
+        price=float(it.get("price", 0.0)),
+        currency=str(it.get("currency", "SAR")),
+        retailer=str(it.get("retailer", "")),
+        link=str(it.get("link", "")),
+        condition=it.get("condition"),
+        reason=it.get("reason"),
+        image=it.get("image"),
+    )
+
+
+def to_rank_response(final: Dict[str, Any], payload: RankRequest) -> RankResponse:
+    """Normalize the agent's final state into the public response shape."""
+    # Basic fields
+    query = final.get("query", payload.query)
+    steps = int(final.get("steps", 0))
+    errors = final.get("errors", []) or []
+
+    # result block:
+    # - إذا finisher رجّع {"query", "steps", "errors", "result": {...}} → نأخذ result
+    # - إذا رجّع مباشرة {"items": [...], "notes": "..."} → نستخدمه كـ result
+    result_block: Dict[str, Any] = final.get("result", final)
+
+    raw_items = result_block.get("items", []) or []
+    notes = result_block.get("notes")
+
+    # Map raw items إلى OfferItem (Pydantic) مع defaultات
+    items = [to_offer_item(it) for it in raw_items]
+
+    return RankResponse(
+        query=query,
+        steps=steps,
+        errors=errors,
+        result=RankResult(items=items, notes=notes),
+        needs_more_info=bool(final.get("needs_more_info")),
+        follow_up_question=final.get("follow_up_question"),
+    )
+
+
+def rank(payload: RankRequest, should_stop: Optional[Callable[[], bool]] = None) -> RankResponse:
+    """Run one ranking request end to end (blocking), profiling it if requested."""
+    return rank_with_state(payload, should_stop)[0]
+
+
+def rank_with_state(
+    payload: RankRequest, should_stop: Optional[Callable[[], bool]] = None
+) -> Tuple[RankResponse, Dict[str, Any]]:
+    """Like rank, also returning the agent's final state."""
+    if profile_enabled.get():
+        with profile_request(request_id_var.get() or new_request_id(), label="rank"):
+            return _rank(payload, should_stop)
+    return _rank(payload, should_stop)
+
+
+def _rank(
+    payload: RankRequest, should_stop: Optional[Callable[[], bool]] = None
+) -> Tuple[RankResponse, Dict[str, Any]]:
+    started = time.perf_counter()
+    final = run_agent(build_init_state(payload), should_stop)
+
+    # Full state dumps are sampled; serialization happens on the log thread
+    if should_sample_state():
+        logger.info({"event": "rank.final_state", "state": final})
+
+    response = to_rank_response(final, payload)
+    logger.info({
+        "event": "rank.completed",
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "steps": response.steps,
+        "items": len(response.result.items),
+        "errors": len(response.errors),
+        "needs_more_info": response.needs_more_info,
+    })
+    return response, final
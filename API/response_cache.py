@@ -0,0 +1,151 @@
+# API/response_cache.py
+"""
+Cache of final /rank responses.
+
+Entries are keyed on (canonical query, trusted_only, execution mode) and
+hold the serialized JSON body plus its ETag, so a hit skips the graph,
+ranking and Pydantic serialization entirely. Many phrasings share one key,
+so the body is stored without `query`; `render` puts the caller's own text
+back (and derives a per-text ETag) when serving it. Each entry remembers the
+`fetched_at` of the search-cache entry it was built from; once those offers
+are refreshed the response is treated as stale and rebuilt. Responses that
+ask for more info, carry errors or have no items are not cached.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from Core.cache_backends import CacheBackend, make_backend
+from Core.config import RANK_CACHE_SIZE, RANK_CACHE_TTL, AGENT_EXECUTION_MODE
+from Core.executor import dumps_json
+from Agent.normalizers import canonical_query_key
+from Agent.search_cache import offer_cache, popularity
+from .rank_service import rank_with_state
+from .schemas import RankRequest, RankResponse
+
+
+def _cacheable(response: RankResponse) -> bool:
+    return not response.needs_more_info and not response.errors and bool(response.result.items)
+
+
+class RankResponseCache:
+    """Serialized RankResponse bodies with ETags, invalidated by offer refreshes."""
+
+    def __init__(
+        self,
+        max_entries: int = RANK_CACHE_SIZE,
+        ttl: int = RANK_CACHE_TTL,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend or make_backend("responses", max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, payload: RankRequest) -> str:
+        return f"{canonical_query_key(payload.query)}|trusted={int(bool(payload.trusted_only))}|mode={AGENT_EXECUTION_MODE}"
+
+    def _fresh(self, entry: Dict[str, Any]) -> bool:
+        """False once the offers the response was built from have been refetched."""
+        offers = offer_cache.peek(entry["offers_key"])
+        return offers is None or offers["fetched_at"] == entry["offers_fetched_at"]
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Fresh entry for key, without counting towards hit/miss stats."""
+        entry = self.backend.get(key) if self.enabled else None
+        if entry is not None and not self._fresh(entry):
+            self.backend.delete(key)
+            with self._lock:
+                self.stale += 1
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.peek(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is not None:
+            # keep refresh-ahead informed about queries served from here
+            popularity.record(entry["offers_key"], entry["search_query"])
+        return entry
+
+    def build(self, response: RankResponse, final: Dict[str, Any]) -> Dict[str, Any]:
+        """Serialize a response once (without `query`) and derive its ETag."""
+        data = jsonable_encoder(response)
+        data.pop("query", None)
+        body = dumps_json(data)
+        search_query = final.get("search_query") or response.query
+        offers_key = canonical_query_key(search_query)
+        offers = offer_cache.peek(offers_key)
+        return {
+            "body": body,
+            "etag": '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"',
+            "search_query": search_query,
+            "offers_key": offers_key,
+            "offers_fetched_at": offers["fetched_at"] if offers else None,
+            "expires_at": time.time() + self.ttl,
+            "cacheable": _cacheable(response),
+        }
+
+    @staticmethod
+    def render(entry: Dict[str, Any], query: str) -> Dict[str, Any]:
+        """The entry with `body`/`etag` for one caller's query text."""
+        head = '{"query":' + dumps_json(query)
+        body = head + ("}" if entry["body"] == "{}" else "," + entry["body"][1:])
+        digest = hashlib.sha256((entry["etag"] + "\0" + query).encode("utf-8")).hexdigest()[:32]
+        return {**entry, "body": body, "etag": '"' + digest + '"'}
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        if self.enabled and entry["cacheable"]:
+            self.backend.set(key, entry, self.ttl)
+
+    def lock(self, key: str):
+        return self.backend.lock(key)
+
+    def purge(self) -> int:
+        return self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self.backend.size()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+response_cache = RankResponseCache()
+
+
+def cached_rank(payload: RankRequest) -> Dict[str, Any]:
+    """Serialized /rank response entry ({"body", "etag", "expires_at", "cacheable", ...}), from cache when fresh."""
+    key = response_cache.key(payload)
+    entry = response_cache.get(key)
+    if entry is None:
+        # Identical concurrent requests wait for one run instead of all running the graph
+        with response_cache.lock(key):
+            entry = response_cache.peek(key)
+            if entry is None:
+                response, final = rank_with_state(payload)
+                entry = response_cache.build(response, final)
+                response_cache.put(key, entry)
+    return response_cache.render(entry, payload.query)
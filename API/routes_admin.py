@@ -0,0 +1,58 @@
+# API/routes_admin.py
+from __future__ import annotations
+
+import hmac
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from Core.config import ADMIN_TOKEN
+from Core.profiling import list_profiles, load_profile
+from .response_cache import response_cache
+
+
+def is_admin_token(value: Optional[str]) -> bool:
+    """True when ADMIN_TOKEN is configured and value matches it."""
+    return bool(ADMIN_TOKEN and value) and hmac.compare_digest(value, ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Guard admin routes with ADMIN_TOKEN; they stay closed while it is unset."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (ADMIN_TOKEN not set).")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+def get_profiles() -> List[Dict[str, Any]]:
+    """List saved request profiles, newest first."""
+    return list_profiles()
+
+
+@router.get("/profiles/{request_id}")
+def get_profile(request_id: str) -> Dict[str, Any]:
+    """Profile metadata, top allocation sites and collapsed CPU stacks."""
+    profile = load_profile(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return profile
+
+
+@router.get("/profiles/{request_id}/cpu.folded", response_class=PlainTextResponse)
+def get_profile_folded(request_id: str) -> str:
+    """Collapsed stacks in flamegraph.pl / speedscope format."""
+    profile = load_profile(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return profile["cpu_folded"]
+
+
+@router.delete("/rank-cache")
+def purge_rank_cache() -> Dict[str, int]:
+    """Drop every cached /rank response (e.g. after a prompt or ranking change)."""
+    return {"purged": response_cache.purge()}
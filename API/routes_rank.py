@@ -1,22 +1,54 @@
 # API/routes_rank.py
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
 
-from Agent import build_app, AgentState
+from Agent.normalizers import canonicalize_query
+from Agent.ranking import rank_item_sink
 from Core.config import OPENAI_API_KEY
-from .schemas import RankRequest, RankResponse, RankResult, OfferItem
+from Core.executor import dumps_json
+from .rank_jobs import rank_jobs, job_store, JobQueueFull, TERMINAL
+from .rank_service import rank, to_offer_item
+from .response_cache import cached_rank
+from .schemas import RankRequest, RankResponse, RankJob, QueryKeyResponse
 
 router = APIRouter(prefix="/rank", tags=["rank"])
 
-# Build LangGraph app once per process
-agent_app = build_app()
+
+def _cached_response(entry: Dict[str, Any], request: Optional[Request] = None) -> Response:
+    """
+    Serve a cached-rank entry as JSON. With the GET request it also carries
+    ETag/Cache-Control (304 when If-None-Match matches); POST gets the body only.
+    """
+    if request is None:
+        return Response(content=entry["body"], media_type="application/json")
+    if entry["cacheable"]:
+        max_age = max(int(entry["expires_at"] - time.time()), 0)
+        headers = {"ETag": entry["etag"], "Cache-Control": f"public, max-age={max_age}"}
+    else:
+        headers = {"ETag": entry["etag"], "Cache-Control": "no-store"}
+    if _etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # weak comparison, as RFC 9110 prescribes for If-None-Match
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
 
 
 @router.post("", response_model=RankResponse)
-async def rank_products(payload: RankRequest) -> RankResponse:
+async def rank_products(payload: RankRequest) -> Response:
     """
     Main endpoint:
     - Accepts a query (e.g. 'iPhone 15 Pro Max 256GB').
@@ -25,78 +57,107 @@ async def rank_products(payload: RankRequest) -> RankResponse:
     """
     if not OPENAI_API_KEY:
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY missing (set env var).")
+    # The agent run is blocking; keep it off the event loop
+    return _cached_response(await run_in_threadpool(cached_rank, payload))
+
+
+@router.get("", response_model=RankResponse)
+async def rank_products_get(request: Request, query: str, trusted_only: bool = True) -> Response:
+    """
+    Cacheable GET form of POST /rank.
+
+    Returns an ETag and Cache-Control max-age; a matching If-None-Match
+    gets 304 Not Modified with no body.
+    """
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="OPENAI_API_KEY missing (set env var).")
+    payload = RankRequest(query=query, trusted_only=trusted_only)
+    return _cached_response(await run_in_threadpool(cached_rank, payload), request)
 
-    init_state: AgentState = {
-        "query": payload.query,
-        "offers": [],
-        "missing": [],
-        "tried_tools": [],
-        "steps": 0,
-        "done": False,
-        "errors": [],
-        "trusted_only": bool(payload.trusted_only),
-    }
-
-    final: Dict[str, Any] | None = None
-
-    # Run the LangGraph agent and capture the final state
-    for event in agent_app.stream(init_state):
-        for node, node_payload in event.items():
-            if node == "finish":
-                # node_payload is what finisher() returned
-                final = node_payload
-
-    if final is None:
-        raise HTTPException(status_code=500, detail="Agent did not reach finish node.")
-
-    # Debug: print final to console (useful الآن عشان تشوف شلون شكله)
-    print("\n[FINAL STATE FROM AGENT]")
+
+@router.post("/stream")
+async def rank_products_stream(payload: RankRequest) -> StreamingResponse:
+    """
+    Streaming variant of /rank (NDJSON).
+
+    Emits {"event": "item", ...} for each recommendation as soon as the LLM
+    finishes it, then one {"event": "result", ...} line with the full
+    RankResponse (or {"event": "error", ...}).
+    """
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="OPENAI_API_KEY missing (set env var).")
+
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+
+    def emit(kind: str, value: Any) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+
+    def run() -> None:
+        token = rank_item_sink.set(lambda it: emit("item", it))
+        try:
+            emit("result", rank(payload))
+        except HTTPException as e:
+            emit("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            emit("error", {"status": 500, "detail": str(e)})
+        finally:
+            rank_item_sink.reset(token)
+
+    async def body() -> AsyncIterator[bytes]:
+        worker = asyncio.create_task(asyncio.to_thread(run))
+        try:
+            while True:
+                kind, value = await queue.get()
+                line: Dict[str, Any] = {"event": kind}
+                if kind == "item":
+                    line["item"] = jsonable_encoder(to_offer_item(value))
+                elif kind == "result":
+                    line["response"] = jsonable_encoder(value)
+                else:
+                    line.update(value)
+                yield (dumps_json(line) + "\n").encode("utf-8")
+                if kind != "item":
+                    break
+        finally:
+            await worker
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@router.post("/jobs", response_model=RankJob, status_code=202)
+def create_rank_job(payload: RankRequest) -> RankJob:
+    """Queue a ranking request and return its job id immediately; poll GET /rank/jobs/{id}."""
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="OPENAI_API_KEY missing (set env var).")
     try:
-        import json
-        print(json.dumps(final, ensure_ascii=False, indent=2))
-    except Exception:
-        print(final)
-
-    # ---- Normalize the shape for RankResponse ----
-
-    # Basic fields
-    query = final.get("query", payload.query)
-    steps = int(final.get("steps", 0))
-    errors = final.get("errors", []) or []
-
-    # result block:
-    # - إذا finisher رجّع {"query", "steps", "errors", "result": {...}} → نأخذ result
-    # - إذا رجّع مباشرة {"items": [...], "notes": "..."} → نستخدمه كـ result
-    result_block: Dict[str, Any] = final.get("result", final)
-
-    raw_items = result_block.get("items", []) or []
-    notes = result_block.get("notes")
-
-    # Map raw items إلى OfferItem (Pydantic) مع defaultات
-    items: list[OfferItem] = []
-    for it in raw_items:
-        # نضمن الحقول الأساسية لو ناقصة
-        item = OfferItem(
-            name=str(it.get("name", "")),
-            price=float(it.get("price", 0.0)),
-            currency=str(it.get("currency", "SAR")),
-            retailer=str(it.get("retailer", "")),
-            link=str(it.get("link", "")),
-            condition=it.get("condition"),
-            reason=it.get("reason"),
-            image=it.get("image"),
-        )
-        items.append(item)
-
-    result = RankResult(items=items, notes=notes)
-
-    # Build final Pydantic response
-    response = RankResponse(
-        query=query,
-        steps=steps,
-        errors=errors,
-        result=result,
-        needs_more_info=bool(final.get("needs_more_info")),
-        follow_up_question=final.get("follow_up_question"),
-    )
-    return response
+        job = rank_jobs.submit(payload)
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="Too many queued jobs.", headers={"Retry-After": "30"})
+    return RankJob(**job)
+
+
+@router.get("/jobs/{job_id}", response_model=RankJob)
+def get_rank_job(job_id: str) -> RankJob:
+    """Job status, with the RankResponse once it has succeeded."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return RankJob(**job)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=RankJob)
+def cancel_rank_job(job_id: str) -> RankJob:
+    """Cancel a queued job, or stop a running one after its current step."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    if job["status"] in TERMINAL:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}.")
+    return RankJob(**(job_store.cancel(job_id) or job))
+
+
+@router.get("/debug/query-key", response_model=QueryKeyResponse)
+def debug_query_key(q: str) -> QueryKeyResponse:
+    """Show how a query is canonicalized for cache keys."""
+    return QueryKeyResponse(query=q, **canonicalize_query(q))
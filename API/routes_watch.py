@@ -0,0 +1,40 @@
+# API/routes_watch.py
+from __future__ import annotations
+
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+
+from Agent.price_watch import watch_store
+from .schemas import WatchCreate, Watch, WatchAlert
+
+router = APIRouter(prefix="/watches", tags=["watches"])
+
+
+@router.post("", response_model=Watch, status_code=201)
+def create_watch(payload: WatchCreate) -> Watch:
+    """Alert `user_id` when `query` is offered at or below `max_price_sar`."""
+    if payload.max_price_sar <= 0:
+        raise HTTPException(status_code=422, detail="max_price_sar must be positive.")
+    return Watch(**watch_store.create(
+        payload.user_id, payload.query, payload.max_price_sar, payload.trusted_only,
+    ))
+
+
+@router.get("", response_model=List[Watch])
+def list_watches(user_id: str) -> List[Watch]:
+    """Watches registered by `user_id`."""
+    return [Watch(**w) for w in watch_store.list(user_id)]
+
+
+@router.delete("/{watch_id}", status_code=204)
+def delete_watch(watch_id: str, user_id: str) -> None:
+    # Another user's watch is reported as missing, not forbidden, so ids can't be probed
+    if not watch_store.delete(watch_id, user_id):
+        raise HTTPException(status_code=404, detail="Watch not found.")
+
+
+@router.get("/alerts", response_model=List[WatchAlert])
+def poll_alerts(user_id: str, since_id: int = 0, limit: int = 100) -> List[WatchAlert]:
+    """Triggered alerts for `user_id` newer than `since_id`; pass the last id you saw to poll."""
+    return [WatchAlert(**a) for a in watch_store.alerts(user_id, since_id, min(max(limit, 1), 500))]
@@ -38,3 +38,61 @@ class RankResponse(BaseModel):
     result: RankResult
     needs_more_info: bool = False
     follow_up_question: Optional[str] = None
+
+
+class RankJob(BaseModel):
+    """Status of an asynchronous rank job; `result` is set once it succeeds."""
+    id: str
+    status: str  # queued | running | succeeded | failed | cancelled
+    query: str
+    trusted_only: bool
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    expires_at: float
+    result: Optional[RankResponse] = None
+    error: Optional[str] = None
+
+
+class QueryKeyResponse(BaseModel):
+    """Canonical form of a query (debug endpoint)."""
+    query: str
+    key: str
+    text: str
+    model: Optional[str] = None
+    storage: Optional[str] = None
+    tokens: List[str] = []
+
+
+class WatchCreate(BaseModel):
+    """Request body for creating a price watch."""
+    user_id: str
+    query: str
+    max_price_sar: float
+    trusted_only: bool = True
+
+
+class Watch(BaseModel):
+    """A stored price watch."""
+    id: str
+    user_id: str
+    query: str
+    query_key: str
+    max_price_sar: float
+    trusted_only: bool
+    created_at: float
+    last_alert_price: Optional[float] = None
+
+
+class WatchAlert(BaseModel):
+    """A triggered price alert."""
+    id: int
+    watch_id: str
+    user_id: str
+    query: str
+    max_price_sar: float
+    price_sar: float
+    name: Optional[str] = None
+    retailer: Optional[str] = None
+    link: Optional[str] = None
+    created_at: float
@@ -1,19 +1,28 @@
 # app/agent/graph.py
 from __future__ import annotations
 
-import json
-from typing import TypedDict, List, Dict, Any, Optional
+import logging
+import operator
+from typing import Annotated, TypedDict, List, Dict, Any, Optional
 
 from langgraph.graph import StateGraph, START, END
 # لا نستخدم MemorySaver عشان ما نحتاج thread_id
 # from langgraph.checkpoint.memory import MemorySaver
 
-from Core.constants import TRUSTED_KSA
-from Agent.tools import shopping_search, product_page_fetch
-from Agent.normalizers import spec_normalizer, price_normalizer
-from Agent.ranking import llm_rank_offers
+from Core.config import AGENT_EXECUTION_MODE
+from Core.logger import get_logger
+from Core.ratelimit import RateLimitExceeded
+from Agent.tools import product_page_fetch, page_cache
+from Agent.search_cache import cached_offers
+from Agent.normalizers import spec_normalizer, price_normalizer, canonicalize_query
+from Agent.ranking import llm_rank_offers, rank_item_sink
+from Agent.selection import (
+    RANK_POOL_SIZE, TOP_K, is_trusted, is_relevant, pass_basic, presort_key, page_fetch_urls, pareto_prune,
+)
 from Agent.intent import analyze_intent
 
+logger = get_logger("agent.graph")
+
 
 class AgentState(TypedDict, total=False):
     query: str
@@ -30,6 +39,55 @@ class AgentState(TypedDict, total=False):
     follow_up_question: Optional[str]
     search_query: str
     clarification_count: int
+    result: Dict[str, Any]
+
+
+class FusedAgentState(AgentState, total=False):
+    """State for the fused graph: nodes return partial updates merged by reducers."""
+    tried_tools: Annotated[List[str], operator.add]
+    errors: Annotated[List[str], operator.add]
+    plan: List[Dict[str, Any]]
+
+
+# -----------------------------
+# Shared helpers
+# -----------------------------
+def resolve_intent(state: AgentState) -> Dict[str, Any]:
+    """Analyze the query and return the state fields that intent resolution sets."""
+    q = state.get("query", "")
+    intent = analyze_intent(q)
+    update: Dict[str, Any] = {"intent": intent, "search_query": intent.get("search_query", q)}
+    if not intent.get("ready", False):
+        clarifications = state.get("clarification_count", 0)
+        if clarifications < 1:
+            update.update({
+                "needs_more_info": True,
+                "follow_up_question": intent.get("follow_up_question"),
+                "clarification_count": clarifications + 1,
+                "done": True,
+            })
+            return update
+        # already asked once; proceed with best effort
+        intent["ready"] = True
+        intent["follow_up_question"] = None
+    # ready now -> ensure flags cleared
+    update.update({"needs_more_info": False, "follow_up_question": None})
+    return update
+
+
+def apply_page_specs(offers: List[Dict[str, Any]], urls: List[str]) -> None:
+    """Fetch product pages and copy any extracted model/storage onto matching offers."""
+    url_map = page_cache.get_many(urls)
+    for u in urls:
+        if u not in url_map:
+            url_map[u] = product_page_fetch(u)
+    for o in offers:
+        u = o.get("link")
+        if u in url_map and url_map[u].get("ok"):
+            if url_map[u].get("model"):
+                o["model"] = url_map[u]["model"]
+            if url_map[u].get("storage"):
+                o["storage"] = url_map[u]["storage"]
 
 
 # -----------------------------
@@ -42,28 +100,10 @@ def planner(state: AgentState) -> AgentState:
     tried = set(state.get("tried_tools", []))
     offers = state.get("offers", [])
 
-    intent = state.get("intent")
-    if not intent:
-        intent = analyze_intent(q)
-        state["intent"] = intent
-        state["search_query"] = intent.get("search_query", q)
-        if not intent.get("ready", False):
-            clarifications = state.get("clarification_count", 0)
-            if clarifications >= 1:
-                # already asked once; proceed with best effort
-                intent["ready"] = True
-                intent["follow_up_question"] = None
-                state["needs_more_info"] = False
-                state["follow_up_question"] = None
-            else:
-                state["needs_more_info"] = True
-                state["follow_up_question"] = intent.get("follow_up_question")
-                state["clarification_count"] = clarifications + 1
-                state["done"] = True
-                return state
-        # ready now -> ensure flags cleared
-        state["needs_more_info"] = False
-        state["follow_up_question"] = None
+    if not state.get("intent"):
+        state.update(resolve_intent(state))
+        if state.get("done"):
+            return state
 
     # Enforce max of 5 tool steps (roughly 5 agent messages)
     if steps >= 5:
@@ -93,7 +133,7 @@ def planner(state: AgentState) -> AgentState:
 
     # Optionally enrich by fetching product pages if we still lack details
     if offers and "product_page_fetch_batch" not in tried:
-        urls = [o.get("link") for o in offers[:3] if o.get("link")]
+        urls = page_fetch_urls(offers, state.get("intent") or {}, bool(state.get("trusted_only")))
         if urls:
             state["next_tool"] = {"name": "product_page_fetch_batch", "args": {"urls": urls}}
             return state
@@ -123,7 +163,7 @@ def actor(state: AgentState) -> AgentState:
 
     try:
         if name == "shopping_search":
-            res = shopping_search(**args)
+            res = cached_offers(**args)
             state.setdefault("offers", []).extend(res)
 
         elif name == "spec_normalizer_batch":
@@ -136,20 +176,16 @@ def actor(state: AgentState) -> AgentState:
                 o.update(norm)
 
         elif name == "product_page_fetch_batch":
-            url_map = {u: product_page_fetch(u) for u in args.get("urls", [])}
-            for o in state.get("offers", []):
-                u = o.get("link")
-                if u in url_map and url_map[u].get("ok"):
-                    if url_map[u].get("model"):
-                        o["model"] = url_map[u]["model"]
-                    if url_map[u].get("storage"):
-                        o["storage"] = url_map[u]["storage"]
+            apply_page_specs(state.get("offers", []), args.get("urls", []))
 
         elif name == "price_normalizer_batch":
             for o in state.get("offers", []):
                 normp = price_normalizer(o.get("price", 0.0), o.get("currency"))
                 o.update(normp)
 
+    except RateLimitExceeded:
+        # Overload must surface as 429, not as an empty result
+        raise
     except Exception as e:
         state.setdefault("errors", []).append(f"{name}: {e}")
 
@@ -180,12 +216,13 @@ def observer(state: AgentState) -> AgentState:
 
 # -----------------------------
 # Finisher
-# -----------------------------def finisher(state: AgentState) -> Dict[str, Any]:
+# -----------------------------
 def finisher(state: AgentState) -> Dict[str, Any]:
     """
     Final node:
     - Filter candidates
     - Prefer trusted sellers
+    - Prune dominated offers (answer directly if one relevant offer beats all others)
     - Call LLM re-ranker
     - Store result in state["result"]
     - Return the updated state
@@ -203,46 +240,8 @@ def finisher(state: AgentState) -> Dict[str, Any]:
         return state
 
     intent = state.get("intent", {})
-    category = (intent.get("category") or "").lower()
-    min_budget = intent.get("budget_min")
-    max_budget = intent.get("budget_max")
-    must_have = intent.get("must_have", [])
-    nice_to_have = intent.get("nice_to_have", [])
-
-    def pass_basic(o: Dict[str, Any]) -> bool:
-        """Basic validation before LLM ranking."""
-        name = (o.get("name") or "").lower()
-        price_val = o.get("price_sar", o.get("price"))
-        link = o.get("link")
-
-        if not link or price_val is None:
-            return False
-        try:
-            price = float(price_val)
-        except Exception:
-            return False
-
-        if isinstance(min_budget, (int, float)) and price < float(min_budget):
-            return False
-        if isinstance(max_budget, (int, float)) and price > float(max_budget):
-            return False
-
-        if category and category not in name:
-            return False
-
-        # Ensure must-have keywords appear somewhere
-        for token in must_have:
-            token_lower = token.lower()
-            if token_lower and token_lower not in name:
-                return False
-
-        return True
-
-    candidates = [o for o in offers if pass_basic(o)]
-
-    def is_trusted(o: Dict[str, Any]) -> bool:
-        return o.get("retailer") in TRUSTED_KSA
 
+    candidates = [o for o in offers if pass_basic(o, intent)]
     trusted_candidates = [c for c in candidates if is_trusted(c)]
 
     # Case 1: user wants trusted_only and there is no trusted candidate
@@ -268,35 +267,43 @@ def finisher(state: AgentState) -> Dict[str, Any]:
         }
         return state
 
-    def cond_rank(c: str) -> int:
-        """Rank conditions: New < Refurbished < Used < Unknown."""
-        c = (c or "").lower()
-        if c.startswith("new"):
-            return 0
-        if c.startswith("refurb"):
-            return 1
-        if c.startswith("used"):
-            return 2
-        return 3
-
-    # Local pre-sort before LLM
-    base.sort(
-        key=lambda x: (
-            0 if is_trusted(x) else 1,
-            cond_rank(x.get("condition")),
-            float(x.get("price_sar", x.get("price", 9e9))),
-        )
-    )
-
-    # LLM re-ranking (keeps links & images)
-    ranked = llm_rank_offers(base[:20], q, intent=intent, trusted_only=trusted_only, top_k=4)
+    # Drop offers another offer of the queried model/storage beats on price,
+    # condition, trust and must-haves at once
+    canon = canonicalize_query(state.get("search_query") or q)
+    frontier, near = pareto_prune(base, canon["model"], canon["storage"], intent.get("must_have", []))
+
+    if len(frontier) == 1 and is_relevant(frontier[0], canon["model"], canon["storage"]):
+        # One offer of the requested product beats every other offer: nothing for the LLM to weigh
+        best = frontier[0]
+        item = {
+            "name": best.get("name"),
+            "price": best.get("price_sar", best.get("price")),
+            "currency": "SAR" if "price_sar" in best else best.get("currency", "SAR"),
+            "retailer": best.get("retailer"),
+            "link": best.get("link"),
+            "condition": best.get("condition"),
+            "image": best.get("image"),
+            "reason": "Lowest price with the best condition and seller trust among matching offers.",
+        }
+        sink = rank_item_sink.get()
+        if sink is not None:
+            sink(item)
+        ranked: Dict[str, Any] = {"items": [item], "notes": None}
+    else:
+        # Local pre-sort of the frontier and near-frontier offers before LLM
+        pool = sorted(frontier + near, key=presort_key)
+
+        # LLM re-ranking (keeps links & images)
+        ranked = llm_rank_offers(pool[:RANK_POOL_SIZE], q, intent=intent, trusted_only=trusted_only, top_k=TOP_K)
 
-    try:
-        print("\nTop Picks (trusted first, New→Used, lowest price):")
-        for it in ranked.get("items", []):
-            print(f"- {it['retailer']} | {it['name']} | {it['price']} {it['currency']}\n  {it['link']}")
-    except Exception:
-        pass
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug({
+            "event": "finisher.top_picks",
+            "items": [
+                {"retailer": it.get("retailer"), "name": it.get("name"), "price": it.get("price")}
+                for it in ranked.get("items", [])
+            ],
+        })
 
     # Store result in the state (this is what FastAPI will see)
     state["result"] = {
@@ -307,11 +314,134 @@ def finisher(state: AgentState) -> Dict[str, Any]:
 
     return state
 
+
+# -----------------------------
+# Fused execution
+# -----------------------------
+def fused_planner(state: FusedAgentState) -> Dict[str, Any]:
+    """Resolve intent, then emit the whole tool plan at once (partial update)."""
+    update: Dict[str, Any] = {}
+    if not state.get("intent"):
+        update = resolve_intent(state)
+        if update.get("done"):
+            return update
+
+    search_query = update.get("search_query") or state.get("search_query") or state.get("query", "")
+    update["plan"] = [
+        {"name": "shopping_search", "args": {"query": search_query, "limit": 40}},
+        {"name": "normalize_batch", "args": {}},
+        {"name": "product_page_fetch_batch", "args": {}},
+    ]
+    return update
+
+
+def run_plan(state: FusedAgentState) -> Dict[str, Any]:
+    """
+    Execute the whole plan in one node.
+
+    The CPU-only steps (dedupe, spec and price normalization) run as a single
+    pass over the offers; only the fields that changed are returned.
+    """
+    offers: List[Dict[str, Any]] = list(state.get("offers", []))
+    tried: List[str] = []
+    errors: List[str] = []
+
+    for step in state.get("plan", []):
+        name = step.get("name")
+        args = step.get("args", {})
+        tried.append(name)
+        try:
+            if name == "shopping_search":
+                offers.extend(cached_offers(**args))
+                if not offers:
+                    errors.append("No offers found from shopping_search")
+                    break
+
+            elif name == "normalize_batch":
+                seen = set()
+                fused: List[Dict[str, Any]] = []
+                for o in offers:
+                    lk = o.get("link")
+                    if not lk or lk in seen:
+                        continue
+                    seen.add(lk)
+                    o.update(spec_normalizer(o.get("name", ""), o.get("retailer", ""), o.get("condition", "")))
+                    if "price_sar" not in o:
+                        o.update(price_normalizer(o.get("price", 0.0), o.get("currency")))
+                    fused.append(o)
+                offers = fused
+
+            elif name == "product_page_fetch_batch":
+                urls = page_fetch_urls(offers, state.get("intent") or {}, bool(state.get("trusted_only")))
+                if urls:
+                    apply_page_specs(offers, urls)
+
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+
+    return {
+        "offers": offers,
+        "tried_tools": tried,
+        "errors": errors,
+        "steps": state.get("steps", 0) + len(tried),
+        "done": True,
+    }
+
+
+def fused_finisher(state: FusedAgentState) -> Dict[str, Any]:
+    """Run finisher on a shallow copy and return only what it changed."""
+    errors_before = len(state.get("errors", []))
+    out = finisher(dict(state))  # type: ignore[arg-type]
+    update: Dict[str, Any] = {
+        "result": out.get("result"),
+        "needs_more_info": out.get("needs_more_info", False),
+    }
+    new_errors = (out.get("errors") or [])[errors_before:]
+    if new_errors:
+        update["errors"] = new_errors
+    return update
+
+
 # -----------------------------
 # Build Graph
 # -----------------------------
-def build_app():
-    """Build and compile the LangGraph app."""
+def build_app(mode: Optional[str] = None):
+    """
+    Build and compile the LangGraph app.
+
+    mode="stepwise" (default) runs one plan→act→observe round per tool;
+    mode="fused" plans once and executes every tool in a single node.
+    """
+    mode = (mode or AGENT_EXECUTION_MODE).lower()
+    if mode == "fused":
+        return build_fused_app()
+    return build_stepwise_app()
+
+
+def build_fused_app():
+    """plan → run → finish, with partial state updates."""
+    graph = StateGraph(FusedAgentState)
+
+    graph.add_node("plan", fused_planner)
+    graph.add_node("run", run_plan)
+    graph.add_node("finish", fused_finisher)
+
+    graph.add_edge(START, "plan")
+
+    def route_after_plan(state: FusedAgentState):
+        return "finish" if state.get("done") else "run"
+
+    graph.add_conditional_edges("plan", route_after_plan, {"finish": "finish", "run": "run"})
+    graph.add_edge("run", "finish")
+    graph.add_edge("finish", END)
+
+    return graph.compile()
+
+
+def build_stepwise_app():
+    """Original plan → act → observe loop."""
     graph = StateGraph(AgentState)
 
     graph.add_node("plan", planner)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+import threading
+from typing import Any, Dict, List, Optional
 
-from Core.config import client
+from Core.config import INTENT_BATCH_ENABLED, INTENT_BATCH_WINDOW_MS, INTENT_BATCH_MAX_SIZE
+from Core.llm import chat_json, completion_cache, DEFAULT_MODEL
 
 
 INTENT_SYSTEM_PROMPT = (
@@ -15,8 +17,31 @@ INTENT_SYSTEM_PROMPT = (
     "user's language. Always respond with strict JSON matching the schema."
 )
 
+INTENT_BATCH_SYSTEM_PROMPT = (
+    INTENT_SYSTEM_PROMPT
+    + " You will receive several independent user requests, each with an id. "
+    "Analyze each one on its own and respond with JSON of the form "
+    '{"results": [{"id": "<id>", ...fields for that request...}]}, '
+    "with exactly one result per request id."
+)
+
+
+def _intent_user_content(query: str) -> str:
+    return (
+        "User request:\n"
+        f"{query}\n\n"
+        "Respond with JSON."
+    )
+
 
 def analyze_intent(query: str) -> Dict[str, Any]:
+    """Extract the shopping intent for a query (micro-batched when enabled)."""
+    if INTENT_BATCH_ENABLED:
+        return intent_batcher.submit(query)
+    return _analyze_intent_single(query)
+
+
+def _analyze_intent_single(query: str) -> Dict[str, Any]:
     schema = {
         "type": "object",
         "properties": {
@@ -57,24 +82,12 @@ def analyze_intent(query: str) -> Dict[str, Any]:
         ],
     }
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": INTENT_SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": (
-                    "User request:\n"
-                    f"{query}\n\n"
-                    "Respond with JSON."
-                ),
-            },
-        ],
-    )
-    data = json.loads(resp.choices[0].message.content)
+    data = chat_json(INTENT_SYSTEM_PROMPT, _intent_user_content(query))
+    return _normalize_intent(data)
 
+
+def _normalize_intent(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill defaults and map legacy keys on a raw intent object."""
     # Normalize legacy fields (some models might return different keys)
     if "ready" not in data:
         data["ready"] = bool(data.get("enough_information"))
@@ -92,3 +105,123 @@ def analyze_intent(query: str) -> Dict[str, Any]:
 
     return data
 
+
+# -----------------------------
+# Micro-batching
+# -----------------------------
+class _Pending:
+    def __init__(self, query: str):
+        self.query = query
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[_Pending] = []
+        self.closed = threading.Event()
+
+
+class IntentBatcher:
+    """
+    Coalesces concurrent analyze_intent calls into one LLM request.
+
+    The first caller in a window becomes the leader: it waits up to
+    `window_ms` (or until `max_size` callers have joined), sends a single
+    completion asking for an array of intents keyed by id, and fans the
+    results out. Callers whose result is missing or unparseable fall back
+    to an individual call; API errors (rate limits, timeouts, 5xx) are
+    raised to every caller instead, so a failing upstream is not hit again
+    once per caller.
+    """
+
+    def __init__(self, window_ms: float = INTENT_BATCH_WINDOW_MS, max_size: int = INTENT_BATCH_MAX_SIZE):
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_size = max(max_size, 1)
+        self._lock = threading.Lock()
+        self._current = _Batch()
+        self.batches = 0
+        self.batched_requests = 0
+        self.fallbacks = 0
+
+    def submit(self, query: str) -> Dict[str, Any]:
+        # Already answered before (single or batched)? Skip the window entirely.
+        # peek: the single call below does the counted cache lookup.
+        key = completion_cache.key(DEFAULT_MODEL, INTENT_SYSTEM_PROMPT, _intent_user_content(query))
+        if completion_cache.peek(key) is not None:
+            return _analyze_intent_single(query)
+
+        pending = _Pending(query)
+        with self._lock:
+            batch = self._current
+            batch.items.append(pending)
+            leader = len(batch.items) == 1
+            if len(batch.items) >= self.max_size:
+                self._current = _Batch()
+                batch.closed.set()
+
+        if leader:
+            batch.closed.wait(self.window)
+            with self._lock:
+                if self._current is batch:
+                    self._current = _Batch()
+            self._run(batch.items)
+        else:
+            pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+        if pending.result is None:
+            with self._lock:
+                self.fallbacks += 1
+            return _analyze_intent_single(query)
+        return pending.result
+
+    def _run(self, items: List[_Pending]) -> None:
+        try:
+            if len(items) == 1:
+                items[0].result = _analyze_intent_single(items[0].query)
+                return
+            with self._lock:
+                self.batches += 1
+                self.batched_requests += len(items)
+            payload = {"requests": [{"id": str(i), "text": p.query} for i, p in enumerate(items)]}
+            try:
+                data = chat_json(
+                    INTENT_BATCH_SYSTEM_PROMPT,
+                    f"{json.dumps(payload, ensure_ascii=False)}\n\nRespond with JSON.",
+                )
+                results = data.get("results") or []
+                by_id = {str(r.get("id")): r for r in results if isinstance(r, dict)}
+            except (ValueError, AttributeError, TypeError):
+                return  # unparseable batch answer: every caller falls back individually
+            for i, p in enumerate(items):
+                raw = by_id.get(str(i))
+                if raw is None:
+                    continue  # caller falls back to a single call
+                raw = {k: v for k, v in raw.items() if k != "id"}
+                # Seed the single-call cache so repeats skip the LLM entirely
+                completion_cache.put(
+                    completion_cache.key(DEFAULT_MODEL, INTENT_SYSTEM_PROMPT, _intent_user_content(p.query)),
+                    json.dumps(raw, ensure_ascii=False),
+                )
+                p.result = _normalize_intent(raw)
+        except Exception as e:
+            # Upstream failure (or a failed single call): don't retry it per caller
+            for p in items:
+                p.error = e
+        finally:
+            for p in items:
+                p.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "batched_requests": self.batched_requests,
+                "fallbacks": self.fallbacks,
+            }
+
+
+intent_batcher = IntentBatcher()
@@ -1,6 +1,8 @@
 # app/agent/normalizers.py
 from __future__ import annotations
 
+import re
+import unicodedata
 from typing import Dict, Any, Optional, List, Tuple
 
 MODEL_TOKEN_MAP: List[Tuple[str, List[str]]] = [
@@ -21,6 +23,11 @@ STORAGE_TOKEN_MAP: List[Tuple[str, List[str]]] = [
     ("128GB", ["128", "١٢٨"]),
 ]
 
+# Terms that are transliterated in queries but never identify a model alone
+BRAND_TOKEN_MAP: List[Tuple[str, List[str]]] = [
+    ("iPhone", ["ايفون", "آيفون"]),
+]
+
 
 def infer_model_from_text(txt: str) -> Optional[str]:
     for label, tokens in MODEL_TOKEN_MAP:
@@ -65,3 +72,135 @@ def price_normalizer(price: float, currency: Optional[str]) -> Dict[str, Any]:
     rates = {"USD": 3.75, "EUR": 4.1}
     factor = rates.get(currency.upper(), 1.0)
     return {"price_sar": float(price) * factor, "currency": currency.upper()}
+
+
+# -----------------------------
+# Canonical query keys
+# -----------------------------
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_ARABIC_LETTERS = re.compile(r"[\u0621-\u064A]")
+_ARABIC_MARKS = re.compile(r"[\u064B-\u0652\u0670\u0640]")  # harakat, dagger alef, tatweel
+_ALEF_VARIANTS = str.maketrans("أإآٱ", "اااا")
+
+_UNIT_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"(\d+)\s*(?:gb|gig|giga|جيجا|جيجابايت|قيقا|غيغا|غيغابايت)(?!\w)"), r"\1gb"),
+    # bare "g" only after storage-sized numbers, so "5g" (network) stays as is
+    (re.compile(r"(\d{2,})\s*g(?!\w)"), r"\1gb"),
+    (re.compile(r"(\d+)\s*(?:tb|تيرا|تيرابايت|تيرا بايت)(?!\w)"), r"\1tb"),
+    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:inch|in|انش|إنش|بوصه|بوصة)(?!\w)"), r"\1in"),
+    (re.compile(r"(\d+)\s*(?:hz|هرتز)(?!\w)"), r"\1hz"),
+]
+
+
+def _fold_text(txt: str) -> str:
+    """Unicode/digit/alef folding shared by queries and vocab tokens."""
+    txt = unicodedata.normalize("NFKC", txt or "").lower()
+    txt = txt.translate(_DIGITS).translate(_ALEF_VARIANTS)
+    return _ARABIC_MARKS.sub("", txt)
+
+
+def _build_transliterations() -> List[Tuple[re.Pattern, str]]:
+    """
+    Arabic → English replacements derived from the token maps.
+
+    An Arabic token of N words maps to the last N words of its label, e.g.
+    "برو ماكس" → "pro max", "ماكس" → "max", "ايفون 15" → "iphone 15",
+    "ايفون" → "iphone".
+    """
+    pairs: Dict[str, str] = {}
+    for label, tokens in MODEL_TOKEN_MAP + STORAGE_TOKEN_MAP + BRAND_TOKEN_MAP:
+        words = label.lower().split()
+        for token in tokens:
+            folded = _fold_text(token)
+            if not _ARABIC_LETTERS.search(folded):
+                continue
+            n = len(folded.split())
+            pairs.setdefault(folded, " ".join(words[-n:]) if n <= len(words) else label.lower())
+    # Longest first so multi-word phrases win over their parts
+    ordered = sorted(pairs.items(), key=lambda kv: -len(kv[0]))
+    return [(re.compile(rf"(?<!\w){re.escape(src)}(?!\w)"), dst) for src, dst in ordered]
+
+
+_TRANSLITERATIONS = _build_transliterations()
+
+
+def _storage_lookup() -> Dict[str, str]:
+    """Exact storage tokens (after folding) → canonical storage label."""
+    out: Dict[str, str] = {}
+    for label, tokens in STORAGE_TOKEN_MAP:
+        out[label.lower()] = label
+        for token in tokens:
+            folded = normalize_query_text(token).replace(" ", "")
+            out.setdefault(folded, label)
+            if folded.isdigit():
+                out.setdefault(f"{folded}gb", label)
+    return out
+
+
+def normalize_query_text(query: str) -> str:
+    """Fold digits/script, transliterate known Arabic terms and normalize units and spacing."""
+    txt = _fold_text(query)
+    txt = re.sub(r"(\d)\s*\+", r"\1 plus", txt)                # "15+" → "15 plus"
+    txt = re.sub(r"[^\w\s.]", " ", txt)                        # drop punctuation
+    txt = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", txt)               # keep only decimal points
+    txt = re.sub(r"(?<=[^\W\d_]{2})(?=\d)", " ", txt)           # "iphone15" → "iphone 15", keeps "s24"
+    txt = re.sub(r"(?<=\d)(?=[^\W\d_]{2,})", " ", txt)          # "15promax" → "15 promax", keeps "2k"/"5g"
+    for pattern, repl in _TRANSLITERATIONS:
+        txt = pattern.sub(repl, txt)
+
+    txt = re.sub(r"\bpro\s*max\b", "pro max", txt)
+    for pattern, repl in _UNIT_PATTERNS:
+        txt = pattern.sub(repl, txt)
+    return " ".join(txt.split())
+
+
+_STORAGE_LOOKUP = _storage_lookup()
+
+
+def canonicalize_query(query: str) -> Dict[str, Any]:
+    """
+    Reduce a free-text query to a stable, language-independent form.
+
+    Returns the normalized text, detected model/storage, leftover tokens and
+    a `key` suitable for caches, e.g. "model:iphone-15-pro-max storage:256gb".
+    """
+    text = normalize_query_text(query)
+    tokens = text.split()
+
+    model = infer_model_from_text(text)
+    if model:
+        for word in model.lower().split():
+            if word in tokens:
+                tokens.remove(word)
+
+    # The first storage token is the storage; any others ("256 vs 512") stay
+    # in tokens, in canonical form, so comparisons do not collide
+    storage = None
+    for i, tok in enumerate(tokens):
+        label = _STORAGE_LOOKUP.get(tok)
+        if not label:
+            continue
+        if storage is None:
+            storage = label
+        tokens[i] = "" if label == storage else label.lower()
+    tokens = [t for t in tokens if t]
+
+    parts: List[str] = []
+    if model:
+        parts.append("model:" + "-".join(model.lower().split()))
+    if storage:
+        parts.append("storage:" + storage.lower())
+    parts.extend(sorted(set(tokens)))
+
+    return {
+        "key": " ".join(parts),
+        "text": text,
+        "model": model,
+        "storage": storage,
+        "tokens": sorted(set(tokens)),
+    }
+
+
+def canonical_query_key(query: str) -> str:
+    """Stable cache key for a query; equivalent Arabic/English phrasings share it."""
+    return canonicalize_query(query)["key"]
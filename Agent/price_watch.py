@@ -0,0 +1,310 @@
+# app/agent/price_watch.py
+"""
+Shared price-watch service.
+
+Users register "tell me when <query> drops below <price>" watches. A
+background poller groups active watches by canonical query, fetches and
+normalizes each distinct query once per cycle, and evaluates every watch in
+the group against that single result set. Cost therefore scales with the
+number of distinct products watched, not with the number of users.
+
+Every worker process runs the poller loop, but a cycle is claimed through
+a row in the watch database first, so only one worker per host polls per
+interval.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from Core.config import PRICE_WATCH_DB, PRICE_WATCH_INTERVAL
+from Core.constants import TRUSTED_KSA
+from Core.logger import get_logger
+from Core.ratelimit import PRIORITY_BATCH, priority
+from Agent.normalizers import canonicalize_query
+from Agent.search_cache import offer_cache, fetch_offers
+
+logger = get_logger("agent.price_watch")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    max_price_sar REAL NOT NULL,
+    trusted_only INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    last_alert_price REAL
+);
+CREATE INDEX IF NOT EXISTS idx_watches_user ON watches(user_id);
+CREATE INDEX IF NOT EXISTS idx_watches_key ON watches(query_key);
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    watch_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    max_price_sar REAL NOT NULL,
+    price_sar REAL NOT NULL,
+    name TEXT,
+    retailer TEXT,
+    link TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts(user_id, id);
+CREATE TABLE IF NOT EXISTS poll_state (
+    name TEXT PRIMARY KEY,
+    owner TEXT,
+    started_at REAL NOT NULL
+);
+"""
+
+
+class WatchStore:
+    """SQLite-backed storage for watches and triggered alerts."""
+
+    def __init__(self, path: str = PRICE_WATCH_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if not self._ready:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            try:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(_SCHEMA)
+                    self._ready = True
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+
+    def create(self, user_id: str, query: str, max_price_sar: float, trusted_only: bool = True) -> Dict[str, Any]:
+        watch = {
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "query": query,
+            "query_key": canonicalize_query(query)["key"],
+            "max_price_sar": float(max_price_sar),
+            "trusted_only": bool(trusted_only),
+            "created_at": time.time(),
+            "last_alert_price": None,
+        }
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO watches (id, user_id, query, query_key, max_price_sar, trusted_only, created_at) "
+                "VALUES (:id, :user_id, :query, :query_key, :max_price_sar, :trusted_only, :created_at)",
+                watch,
+            )
+        return watch
+
+    def claim_cycle(self, owner: str, interval: float) -> bool:
+        """Atomically claim the next poll cycle; False if another worker ran one within `interval`."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO poll_state (name, started_at) VALUES ('poller', 0)")
+            cur = conn.execute(
+                "UPDATE poll_state SET owner = ?, started_at = ? WHERE name = 'poller' AND started_at <= ?",
+                (owner, now, now - interval),
+            )
+            return cur.rowcount > 0
+
+    def list(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            if user_id is None:
+                rows = conn.execute("SELECT * FROM watches ORDER BY created_at").fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM watches WHERE user_id = ? ORDER BY created_at", (user_id,)
+                ).fetchall()
+        return [_watch_row(r) for r in rows]
+
+    def delete(self, watch_id: str, user_id: str) -> bool:
+        """Delete a watch owned by user_id; False if there is no such watch for that user."""
+        with self._connect() as conn:
+            cur = conn.execute("DELETE FROM watches WHERE id = ? AND user_id = ?", (watch_id, user_id))
+            return cur.rowcount > 0
+
+    def add_alerts(self, alerts: List[Dict[str, Any]]) -> None:
+        """Record triggered alerts and bump each watch's last alerted price, in one transaction."""
+        if not alerts:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO alerts (watch_id, user_id, query, max_price_sar, price_sar, name, retailer, link, created_at) "
+                "VALUES (:watch_id, :user_id, :query, :max_price_sar, :price_sar, :name, :retailer, :link, :created_at)",
+                alerts,
+            )
+            conn.executemany(
+                "UPDATE watches SET last_alert_price = :price_sar WHERE id = :watch_id",
+                alerts,
+            )
+
+    def alerts(self, user_id: Optional[str] = None, since_id: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Alerts with id > since_id (poll with the last id you saw)."""
+        with self._connect() as conn:
+            if user_id is None:
+                rows = conn.execute(
+                    "SELECT * FROM alerts WHERE id > ? ORDER BY id LIMIT ?", (since_id, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM alerts WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+                    (user_id, since_id, limit),
+                ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def _watch_row(row: sqlite3.Row) -> Dict[str, Any]:
+    out = dict(row)
+    out["trusted_only"] = bool(out["trusted_only"])
+    return out
+
+
+def best_offers(query: str, offers: List[Dict[str, Any]]) -> Dict[bool, Optional[Dict[str, Any]]]:
+    """
+    Cheapest relevant offer overall (False) and among trusted retailers (True).
+
+    When the query names a model/storage, offers must match them so cases and
+    other variants in the search results do not trigger alerts.
+    """
+    canon = canonicalize_query(query)
+    best: Dict[bool, Optional[Dict[str, Any]]] = {False: None, True: None}
+    for o in offers:
+        if canon["model"] and o.get("model") != canon["model"]:
+            continue
+        if canon["storage"] and o.get("storage") != canon["storage"]:
+            continue
+        try:
+            price = float(o.get("price_sar", o.get("price")))
+        except (TypeError, ValueError):
+            continue
+        for trusted in (False, True):
+            if trusted and o.get("retailer") not in TRUSTED_KSA:
+                continue
+            cur = best[trusted]
+            if cur is None or price < cur["price_sar"]:
+                best[trusted] = {**o, "price_sar": price}
+    return best
+
+
+def evaluate_watches(watches: List[Dict[str, Any]], best: Dict[bool, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Alerts for watches whose threshold is met by a price lower than their last alert."""
+    now = time.time()
+    alerts: List[Dict[str, Any]] = []
+    for w in watches:
+        offer = best[bool(w["trusted_only"])]
+        if offer is None or offer["price_sar"] > w["max_price_sar"]:
+            continue
+        if w["last_alert_price"] is not None and offer["price_sar"] >= w["last_alert_price"]:
+            continue
+        alerts.append({
+            "watch_id": w["id"],
+            "user_id": w["user_id"],
+            "query": w["query"],
+            "max_price_sar": w["max_price_sar"],
+            "price_sar": offer["price_sar"],
+            "name": offer.get("name"),
+            "retailer": offer.get("retailer"),
+            "link": offer.get("link"),
+            "created_at": now,
+        })
+    return alerts
+
+
+class PriceWatchPoller:
+    """Background loop: one fetch per distinct watched query per cycle, one cycle per host."""
+
+    def __init__(self, store: WatchStore, interval: int = PRICE_WATCH_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self.owner = uuid.uuid4().hex  # identifies this process's claims
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.skipped = 0
+        self.last_cycle: Dict[str, Any] = {}
+
+    def _offers_for(self, query_key: str, query: str) -> List[Dict[str, Any]]:
+        entry = offer_cache.get(query_key)
+        if entry is not None:
+            return entry["offers"]
+        with priority(PRIORITY_BATCH):
+            return fetch_offers(query)
+
+    def run_cycle(self) -> Dict[str, Any]:
+        """Poll every distinct watched query once and record triggered alerts (blocking)."""
+        started = time.perf_counter()
+        groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for w in self.store.list():
+            groups[w["query_key"]].append(w)
+
+        alerts: List[Dict[str, Any]] = []
+        failed = 0
+        for query_key, watches in groups.items():
+            query = watches[0]["query"]
+            try:
+                offers = self._offers_for(query_key, query)
+            except Exception as e:
+                failed += 1
+                logger.warning({"event": "price_watch.fetch_failed", "key": query_key, "error": str(e)})
+                continue
+            alerts.extend(evaluate_watches(watches, best_offers(query, offers)))
+
+        self.store.add_alerts(alerts)
+        self.cycles += 1
+        self.last_cycle = {
+            "queries": len(groups),
+            "watches": sum(len(ws) for ws in groups.values()),
+            "alerts": len(alerts),
+            "failed": failed,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logger.info({"event": "price_watch.cycle", **self.last_cycle})
+        return self.last_cycle
+
+    def run_claimed_cycle(self) -> Optional[Dict[str, Any]]:
+        """Run a cycle unless another worker on this host already ran one this interval."""
+        if not self.store.claim_cycle(self.owner, self.interval):
+            self.skipped += 1
+            return None
+        return self.run_cycle()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.run_claimed_cycle)
+            except Exception as e:
+                logger.warning({"event": "price_watch.cycle_failed", "error": str(e)})
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+watch_store = WatchStore()
+price_watch_poller = PriceWatchPoller(watch_store)
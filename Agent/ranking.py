@@ -2,11 +2,29 @@
 from __future__ import annotations
 
 import json
-from typing import List, Dict, Any
+from contextvars import ContextVar
+from typing import Callable, List, Dict, Any, Optional
 
-from Core.config import client
+from Core.llm import chat_json_stream
+from Core.json_stream import iter_array_items
 from Core.constants import TRUSTED_KSA
 
+ItemSink = Callable[[Dict[str, Any]], None]
+
+# Set by streaming callers (e.g. POST /rank/stream) to receive items as the LLM emits them
+rank_item_sink: ContextVar[Optional[ItemSink]] = ContextVar("rank_item_sink", default=None)
+
+
+def _valid_item(it: Any) -> bool:
+    """Minimal shape check for a streamed ranking item."""
+    if not isinstance(it, dict) or not it.get("name") or not it.get("link"):
+        return False
+    try:
+        float(it.get("price"))
+    except (TypeError, ValueError):
+        return False
+    return True
+
 
 def llm_rank_offers(
     offers: List[Dict[str, Any]],
@@ -14,8 +32,15 @@ def llm_rank_offers(
     intent: Dict[str, Any],
     trusted_only: bool = False,
     top_k: int = 4,
+    on_item: Optional[ItemSink] = None,
 ) -> Dict[str, Any]:
-    """Final LLM re-ranking with policy-aware selection and JSON output."""
+    """
+    Final LLM re-ranking with policy-aware selection and JSON output.
+
+    The completion is streamed and parsed incrementally; each valid item is
+    passed to `on_item` (or the `rank_item_sink` context sink) as soon as it
+    closes, before the rest of the completion has arrived.
+    """
     if not offers:
         return {"items": [], "notes": "No offers available for ranking."}
 
@@ -75,27 +100,39 @@ def llm_rank_offers(
         "required": ["items"],
     }
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system},
-            {
-                "role": "user",
-                "content": (
-                    "User query:\n"
-                    f"{query}\n\n"
-                    "Shopping intent:\n"
-                    f"{json.dumps(policy, ensure_ascii=False)}\n\n"
-                    "Candidate offers:\n"
-                    f"{json.dumps(slim, ensure_ascii=False)}\n\n"
-                    "Return schema:\n"
-                    f"{json.dumps(schema, ensure_ascii=False)}"
-                ),
-            },
-        ],
-    )
-    data = json.loads(resp.choices[0].message.content)
-    data["items"] = data.get("items", [])[:top_k]
+    deltas: List[str] = []
+
+    def tee():
+        for delta in chat_json_stream(
+            system,
+            (
+                "User query:\n"
+                f"{query}\n\n"
+                "Shopping intent:\n"
+                f"{json.dumps(policy, ensure_ascii=False)}\n\n"
+                "Candidate offers:\n"
+                f"{json.dumps(slim, ensure_ascii=False)}\n\n"
+                "Return schema:\n"
+                f"{json.dumps(schema, ensure_ascii=False)}"
+            ),
+        ):
+            deltas.append(delta)
+            yield delta
+
+    sink = on_item or rank_item_sink.get()
+    stream = tee()
+    items: List[Dict[str, Any]] = []
+    for it in iter_array_items(stream, "items"):
+        if len(items) < top_k and _valid_item(it):
+            items.append(it)
+            if sink is not None:
+                sink(it)
+    for _ in stream:  # drain so notes arrive and the completion gets cached
+        pass
+
+    try:
+        data = json.loads("".join(deltas))
+    except ValueError:
+        data = {}
+    data["items"] = items
     return data
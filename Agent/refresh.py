@@ -0,0 +1,127 @@
+# app/agent/refresh.py
+"""
+Refresh-ahead scheduler for popular queries.
+
+Runs inside the FastAPI event loop. At a steady pace derived from the
+upstream budget it picks the hottest query whose cached offers are about to
+expire (or already have) and re-fetches it at batch priority, so hot queries
+never fall back to a cold SearchAPI call on the request path. Queries below
+REFRESH_MIN_SCORE (by default: no hit within the last half-life) are left to
+expire.
+
+Each worker process runs its own scheduler and popularity counters, so the
+upstream budget is per process. With a shared cache backend a key another
+worker has just refreshed is skipped rather than fetched again.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, Optional
+
+from Core.config import REFRESH_TOP_N, REFRESH_BUDGET_PER_MIN, REFRESH_LEAD_SECONDS, REFRESH_MIN_SCORE
+from Core.logger import get_logger
+from Core.ratelimit import PRIORITY_BATCH, priority
+from Agent.search_cache import offer_cache, popularity, fetch_offers
+
+logger = get_logger("agent.refresh")
+
+
+class RefreshScheduler:
+    """Spend at most `budget_per_min` upstream searches refreshing the top-N queries."""
+
+    def __init__(
+        self,
+        top_n: int = REFRESH_TOP_N,
+        budget_per_min: float = REFRESH_BUDGET_PER_MIN,
+        lead_seconds: int = REFRESH_LEAD_SECONDS,
+        min_score: float = REFRESH_MIN_SCORE,
+    ):
+        self.top_n = top_n
+        self.budget_per_min = budget_per_min
+        self.lead_seconds = lead_seconds
+        self.min_score = min_score
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: Dict[str, float] = {}
+        self.refreshed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    @property
+    def interval(self) -> float:
+        return 60.0 / self.budget_per_min
+
+    def _due(self, key: str) -> bool:
+        expires = offer_cache.expires_at(key)
+        return expires is None or expires <= time.time() + self.lead_seconds
+
+    def pick(self) -> Optional[tuple]:
+        """Hottest (key, query) above the score floor that expires within the lead window."""
+        for key, query, _score in popularity.top(self.top_n, self.min_score):
+            if key in self._in_flight:
+                continue
+            if self._due(key):
+                return key, query
+        return None
+
+    def _refresh(self, key: str, query: str) -> bool:
+        """Re-fetch unless another worker refreshed the key meanwhile; True if fetched."""
+        with offer_cache.lock(key):
+            if not self._due(key):
+                return False
+            with priority(PRIORITY_BATCH):
+                fetch_offers(query)
+            return True
+
+    async def run_once(self) -> bool:
+        picked = self.pick()
+        if picked is None:
+            return False
+        key, query = picked
+        self._in_flight[key] = time.time()
+        try:
+            if await asyncio.to_thread(self._refresh, key, query):
+                self.refreshed += 1
+                logger.info({"event": "refresh.done", "key": key})
+            else:
+                self.skipped += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning({"event": "refresh.failed", "key": key, "error": str(e)})
+        finally:
+            self._in_flight.pop(key, None)
+        return True
+
+    async def _loop(self) -> None:
+        while True:
+            # Jitter spreads refreshes across workers instead of syncing them
+            await asyncio.sleep(self.interval * random.uniform(0.8, 1.2))
+            await self.run_once()
+
+    def start(self) -> None:
+        if self.budget_per_min <= 0 or self.top_n <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "interval_s": round(self.interval, 2) if self.budget_per_min > 0 else None,
+        }
+
+
+refresh_scheduler = RefreshScheduler()
@@ -0,0 +1,151 @@
+# app/agent/search_cache.py
+"""
+Cache of normalized search results keyed by canonical query.
+
+`fetch_offers` runs shopping_search plus the spec/price normalizers and
+stores the result; `cached_offers` serves from the cache and records query
+popularity so the refresh scheduler knows what to keep warm.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from Core.config import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, POPULARITY_HALF_LIFE
+from Core.cache_backends import CacheBackend, make_backend
+from Agent.tools import shopping_search
+from Agent.normalizers import spec_normalizer, price_normalizer, canonical_query_key
+
+
+class OfferCache:
+    """Normalized offers per canonical query on a pluggable backend (LRU + TTL)."""
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_SIZE,
+        ttl: int = SEARCH_CACHE_TTL,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend or make_backend("offers", max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Like get, without counting towards hit/miss stats."""
+        return self.backend.get(key)
+
+    def put(self, key: str, query: str, offers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        now = time.time()
+        entry = {"query": query, "offers": offers, "fetched_at": now, "expires_at": now + self.ttl}
+        self.backend.set(key, entry, self.ttl)
+        return entry
+
+    def lock(self, key: str):
+        """Per-key lock so concurrent misses fetch a query once."""
+        return self.backend.lock(key)
+
+    def expires_at(self, key: str) -> Optional[float]:
+        return self.backend.expires_at(key)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self.backend.size()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class PopularityTracker:
+    """Exponentially decaying hit counters per canonical query."""
+
+    def __init__(self, half_life: float = POPULARITY_HALF_LIFE, max_keys: int = 4 * SEARCH_CACHE_SIZE):
+        self.decay = math.log(2) / max(half_life, 1)
+        self.max_keys = max_keys
+        # key -> (score, last_update, latest raw query)
+        self._scores: Dict[str, Tuple[float, float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score: float, updated: float, now: float) -> float:
+        return score * math.exp(-self.decay * (now - updated))
+
+    def record(self, key: str, query: str) -> None:
+        now = time.time()
+        with self._lock:
+            score, updated, _ = self._scores.get(key, (0.0, now, query))
+            self._scores[key] = (self._decayed(score, updated, now) + 1.0, now, query)
+            if len(self._scores) > self.max_keys:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        ranked = sorted(self._scores.items(), key=lambda kv: self._decayed(kv[1][0], kv[1][1], now))
+        for key, _ in ranked[: len(ranked) - self.max_keys]:
+            del self._scores[key]
+
+    def top(self, n: int, min_score: float = 0.0) -> List[Tuple[str, str, float]]:
+        """Return up to n (key, query, score) tuples scoring at least min_score, hottest first."""
+        now = time.time()
+        with self._lock:
+            scored = [
+                (key, query, decayed)
+                for key, (score, updated, query) in self._scores.items()
+                if (decayed := self._decayed(score, updated, now)) >= min_score
+            ]
+        scored.sort(key=lambda t: -t[2])
+        return scored[:n]
+
+
+offer_cache = OfferCache()
+popularity = PopularityTracker()
+
+
+def normalize_offers(offers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Spec + price normalization of raw search offers. Pure: returns new dicts."""
+    return [
+        {
+            **o,
+            **spec_normalizer(o.get("name", ""), o.get("retailer", ""), o.get("condition", "")),
+            **price_normalizer(o.get("price", 0.0), o.get("currency")),
+        }
+        for o in offers
+    ]
+
+
+def fetch_offers(query: str, limit: int = 40) -> List[Dict[str, Any]]:
+    """Search + normalize from upstream and refresh the cache entry."""
+    raw = shopping_search(query=query, limit=limit)
+    offers = normalize_offers(raw)
+    offer_cache.put(canonical_query_key(query), query, offers)
+    return offers
+
+
+def cached_offers(query: str, limit: int = 40) -> List[Dict[str, Any]]:
+    """Normalized offers for a query, from cache when fresh. Returns copies."""
+    key = canonical_query_key(query)
+    popularity.record(key, query)
+    entry = offer_cache.get(key)
+    if entry is None:
+        # Concurrent misses (threads, or workers with a shared backend) fetch once
+        with offer_cache.lock(key):
+            entry = offer_cache.peek(key)
+            offers = entry["offers"] if entry else fetch_offers(query, limit)
+    else:
+        offers = entry["offers"]
+    return [dict(o) for o in offers[:limit]]
@@ -0,0 +1,194 @@
+# app/agent/selection.py
+"""
+Candidate selection shared by the planners and the finisher.
+
+The finisher filters offers, prunes dominated ones (pareto_prune),
+pre-sorts the rest locally and sends the top RANK_POOL_SIZE to the LLM. The planners use the same rules to decide which
+product pages are worth fetching: only offers that are missing specs and
+could actually end up in that pool.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from Core.config import RANK_NEAR_FRONTIER_PCT
+from Core.constants import TRUSTED_KSA
+
+# Offers passed to the LLM re-ranker after the local pre-sort
+RANK_POOL_SIZE = 20
+# Picks returned by the ranker
+TOP_K = 4
+# Upper bound on product pages fetched per request
+MAX_PAGE_FETCHES = 3
+
+
+def is_trusted(o: Dict[str, Any]) -> bool:
+    return o.get("retailer") in TRUSTED_KSA
+
+
+def cond_rank(c: Optional[str]) -> int:
+    """Rank conditions: New < Refurbished < Used < Unknown."""
+    c = (c or "").lower()
+    if c.startswith("new"):
+        return 0
+    if c.startswith("refurb"):
+        return 1
+    if c.startswith("used"):
+        return 2
+    return 3
+
+
+def offer_price(o: Dict[str, Any]) -> Optional[float]:
+    try:
+        return float(o.get("price_sar", o.get("price")))
+    except (TypeError, ValueError):
+        return None
+
+
+def presort_key(o: Dict[str, Any]) -> Tuple[int, int, float]:
+    """Local order before LLM ranking: trusted first, then condition, then price."""
+    price = offer_price(o)
+    return (
+        0 if is_trusted(o) else 1,
+        cond_rank(o.get("condition")),
+        price if price is not None else 9e9,
+    )
+
+
+def within_budget(o: Dict[str, Any], intent: Dict[str, Any]) -> bool:
+    price = offer_price(o)
+    if price is None:
+        return False
+    min_budget = intent.get("budget_min")
+    max_budget = intent.get("budget_max")
+    if isinstance(min_budget, (int, float)) and price < float(min_budget):
+        return False
+    if isinstance(max_budget, (int, float)) and price > float(max_budget):
+        return False
+    return True
+
+
+def pass_basic(o: Dict[str, Any], intent: Dict[str, Any]) -> bool:
+    """Basic validation before LLM ranking."""
+    if not o.get("link") or not within_budget(o, intent):
+        return False
+
+    name = (o.get("name") or "").lower()
+    category = (intent.get("category") or "").lower()
+    if category and category not in name:
+        return False
+
+    # Ensure must-have keywords appear somewhere
+    for token in intent.get("must_have", []):
+        token_lower = token.lower()
+        if token_lower and token_lower not in name:
+            return False
+
+    return True
+
+
+def missing_specs(o: Dict[str, Any]) -> bool:
+    return not o.get("model") or not o.get("storage")
+
+
+def page_fetch_urls(
+    offers: List[Dict[str, Any]],
+    intent: Optional[Dict[str, Any]] = None,
+    trusted_only: bool = False,
+    limit: int = MAX_PAGE_FETCHES,
+) -> List[str]:
+    """
+    Product pages worth fetching for extra specs.
+
+    Only offers that lack model/storage and are likely to reach the LLM pool
+    (trusted when trusted_only, passing the finisher's pass_basic filter,
+    inside the top RANK_POOL_SIZE of the local pre-sort) qualify, best-ranked
+    first. Empty when nothing useful is missing.
+    """
+    intent = intent or {}
+    eligible = [o for o in offers if pass_basic(o, intent) and (is_trusted(o) or not trusted_only)]
+    eligible.sort(key=presort_key)
+    urls: List[str] = []
+    for o in eligible[:RANK_POOL_SIZE]:
+        if missing_specs(o) and o["link"] not in urls:
+            urls.append(o["link"])
+            if len(urls) >= limit:
+                break
+    return urls
+
+
+def is_relevant(o: Dict[str, Any], model: Optional[str], storage: Optional[str]) -> bool:
+    """True when the offer is the model (and storage, if asked for) the query names."""
+    if not model or o.get("model") != model:
+        return False
+    if storage:
+        return o.get("storage") == storage
+    return bool(o.get("storage"))
+
+
+def pareto_prune(
+    offers: List[Dict[str, Any]],
+    model: Optional[str] = None,
+    storage: Optional[str] = None,
+    must_have: Iterable[str] = (),
+    near_pct: float = RANK_NEAR_FRONTIER_PCT,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Split offers into (frontier, near) over price, condition rank, trust and
+    missing must-haves, all minimized. An offer that another beats or ties
+    on every dimension (and strictly beats on one) can never be the best pick.
+
+    Only offers that are the queried model/storage (is_relevant) with a known
+    condition are compared, and only against offers of the same storage, so
+    a cheap case or an unlabelled listing never knocks out the product asked
+    for. Every other offer is kept in the frontier untouched; with no model
+    in the query nothing is pruned.
+
+    Comparable offers are swept in price order. The other dimensions take
+    few discrete values, so each offer is checked against the cheapest offer
+    seen per (condition, trust, missing) bucket: O(n log n) overall.
+    Dominated offers priced within near_pct percent of the cheapest offer
+    dominating them are returned as `near`; the rest are dropped.
+    """
+    tokens = [t.lower() for t in must_have if t]
+
+    def dims(o: Dict[str, Any]) -> Tuple[int, int, int]:
+        name = (o.get("name") or "").lower()
+        return (
+            cond_rank(o.get("condition")),
+            0 if is_trusted(o) else 1,
+            sum(1 for t in tokens if t not in name),
+        )
+
+    frontier: List[Dict[str, Any]] = []
+    comparable: List[Tuple[float, Tuple[int, int, int], Dict[str, Any]]] = []
+    for o in offers:
+        price = offer_price(o)
+        d = dims(o)
+        # "Unknown" condition says nothing about the offer: don't rank it worst
+        if price is None or d[0] == 3 or not is_relevant(o, model, storage):
+            frontier.append(o)
+        else:
+            comparable.append((price, d, o))
+
+    comparable.sort(key=lambda t: (t[0], t[1]))
+    cheapest: Dict[Tuple[Any, Tuple[int, int, int]], float] = {}
+    near: List[Dict[str, Any]] = []
+    for price, d, o in comparable:
+        group = o.get("storage")
+        dominator: Optional[float] = None
+        for (bucket_group, bucket), bucket_price in cheapest.items():
+            if bucket_group != group:
+                continue
+            better = (
+                (bucket != d and all(a <= b for a, b in zip(bucket, d)))
+                or (bucket == d and bucket_price < price)
+            )
+            if better and (dominator is None or bucket_price < dominator):
+                dominator = bucket_price
+        if dominator is None:
+            frontier.append(o)
+        elif price <= dominator * (1 + near_pct / 100.0):
+            near.append(o)
+        cheapest.setdefault((group, d), price)
+    return frontier, near
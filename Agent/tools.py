@@ -6,8 +6,12 @@ from typing import List, Dict, Any, Optional
 
 import requests
 
-from Core.config import SEARCHAPI_KEY
+from Core.config import SEARCHAPI_KEY, CPU_OFFLOAD_HTML_KB, PAGE_CACHE_SIZE, PAGE_CACHE_TTL
+from Core.cache_backends import make_backend
 from Core.constants import TRUSTED_KSA  # imported for completeness (if needed)
+from Core.ratelimit import limiter
+from Core.executor import run_cpu
+from Core.json_stream import iter_array_items, iter_decoded
 
 
 def normalize_retailer(name: Optional[str]) -> str:
@@ -64,45 +68,50 @@ def shopping_search(
         "location": location,
         "api_key": SEARCHAPI_KEY,
     }
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-
+    limiter.acquire("searchapi")
     out: List[Dict[str, Any]] = []
-    for it in (data.get("shopping_results") or [])[:limit]:
-        name = it.get("title")
-        price = it.get("extracted_price")
-        link = it.get("product_link")
-        seller = it.get("seller")
-        cond = it.get("condition")
-        thumb = it.get("thumbnail")
-
-        if not name or price is None or not link:
-            continue
-
-        retailer = normalize_retailer(seller or "")
-        out.append({
-            "name": name,
-            "price": float(price),
-            "currency": "SAR",
-            "retailer": retailer,
-            "link": link,
-            "image": thumb,
-            "condition": cond or "",
-            "source": "searchapi_google_shopping",
-        })
+    # Walk only shopping_results[*] as the body streams in; the other sections
+    # (filters, ads, related searches, ...) are skipped without being parsed.
+    with requests.get(url, params=params, timeout=30, stream=True) as r:
+        r.raise_for_status()
+        chunks = iter_decoded(r.iter_content(chunk_size=64 * 1024), r.encoding or "utf-8")
+        for it in iter_array_items(chunks, "shopping_results"):
+            offer = _offer_from_result(it) if isinstance(it, dict) else None
+            if offer is None:
+                continue
+            out.append(offer)
+            if len(out) >= limit:
+                break
     return out
 
 
-def product_page_fetch(url: str) -> Dict[str, Any]:
-    """Fetch page HTML and try to extract clarified specs (placeholder heuristics)."""
-    try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        html = r.text
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
+def _offer_from_result(it: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Compact offer record from one shopping_results item (None if unusable)."""
+    name = it.get("title")
+    price = it.get("extracted_price")
+    link = it.get("product_link")
+    seller = it.get("seller")
+    cond = it.get("condition")
+    thumb = it.get("thumbnail")
+
+    if not name or price is None or not link:
+        return None
+
+    retailer = normalize_retailer(seller or "")
+    return {
+        "name": name,
+        "price": float(price),
+        "currency": "SAR",
+        "retailer": retailer,
+        "link": link,
+        "image": thumb,
+        "condition": cond or "",
+        "source": "searchapi_google_shopping",
+    }
+
 
+def extract_specs_from_html(html: str) -> Dict[str, Any]:
+    """Pure regex extraction of model/storage from page HTML (offloadable stage)."""
     model = None
     if re.search(r"15\s*Pro\s*Max", html, re.I):
         model = "iPhone 15 Pro Max"
@@ -114,3 +123,35 @@ def product_page_fetch(url: str) -> Dict[str, Any]:
         storage = "256GB"
 
     return {"ok": True, "model": model, "storage": storage}
+
+
+# Successful extractions per URL, shared across workers with the sqlite backend
+page_cache = make_backend("pages", PAGE_CACHE_SIZE)
+
+
+def product_page_fetch(url: str) -> Dict[str, Any]:
+    """Extracted specs for a product page, fetched once per URL per TTL."""
+    cached = page_cache.get(url)
+    if cached is not None:
+        return cached
+    with page_cache.lock(url):
+        cached = page_cache.get(url)
+        if cached is not None:
+            return cached
+        result = _fetch_page_specs(url)
+        if result.get("ok"):
+            page_cache.set(url, result, PAGE_CACHE_TTL)
+        return result
+
+
+def _fetch_page_specs(url: str) -> Dict[str, Any]:
+    """Fetch page HTML and try to extract clarified specs (placeholder heuristics)."""
+    try:
+        r = requests.get(url, timeout=20)
+        r.raise_for_status()
+        html = r.text
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+    # Large pages are scanned in a worker process so the caller isn't pinned
+    return run_cpu(extract_specs_from_html, html, size=len(html) / 1024, threshold=CPU_OFFLOAD_HTML_KB)
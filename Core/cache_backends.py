@@ -0,0 +1,349 @@
+# app/core/cache_backends.py
+"""
+Storage backends for the completion, search and page caches.
+
+- MemoryLRUBackend: per-process LRU. Fast, but every worker keeps its own copy.
+- SQLiteBackend: one WAL-mode SQLite file shared by every worker on the host,
+  so a value fetched by one worker is a hit for all of them.
+
+Values must be JSON-serializable. Both backends enforce a TTL per entry and
+an entry cap per namespace, support batch get/set, and offer `lock(key)` /
+`get_or_compute` so only one caller (per host, for SQLite) computes a
+missing key while the others wait for its result.
+
+SQLite hits refresh `accessed_at` (the LRU order) at most once per
+`_TOUCH_INTERVAL` seconds per key, so a hot read path does not turn every
+hit into a write.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Core.config import CACHE_BACKEND, CACHE_PATH
+
+# Minimum age (seconds) of accessed_at before an SQLite hit rewrites it.
+_TOUCH_INTERVAL = 60.0
+
+
+class _KeyLocks:
+    """In-process lock per key, dropped once nobody holds or waits for it."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[str, List[Any]] = {}  # key -> [lock, users]
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+class CacheBackend(ABC):
+    """Key/value store with per-entry TTL. Subclasses implement the storage."""
+
+    def __init__(self):
+        self._key_locks = _KeyLocks()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.set_many({key: value}, ttl)
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Fresh values for the keys that have one (missing/expired keys are absent)."""
+        ...
+
+    @abstractmethod
+    def set_many(self, items: Dict[str, Any], ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def expires_at(self, key: str) -> Optional[float]:
+        """Expiry time of a stored entry (even if already past), without touching LRU order."""
+        ...
+
+    @abstractmethod
+    def clear(self) -> int:
+        """Drop every entry; returns how many were removed."""
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[bool]:
+        """
+        Serialize computation of one key; re-check the cache once inside.
+        Yields whether exclusive access was obtained (always True here).
+        """
+        with self._key_locks.hold(key):
+            yield True
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: float) -> Any:
+        """Cached value, or compute() once and store it. None results are not cached."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self.lock(key):
+            value = self.get(key)
+            if value is None:
+                value = compute()
+                if value is not None:
+                    self.set(key, value, ttl)
+        return value
+
+
+class MemoryLRUBackend(CacheBackend):
+    """Thread-safe in-process LRU with TTL."""
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+        # key -> (value, expires_at)
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        now = time.time()
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                out[key] = entry[0]
+        return out
+
+    def set_many(self, items: Dict[str, Any], ttl: float) -> None:
+        if self.max_entries <= 0:
+            return
+        expires = time.time() + ttl
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def expires_at(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+
+    def clear(self) -> int:
+        with self._lock:
+            n = len(self._entries)
+            self._entries.clear()
+            return n
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache(ns, accessed_at);
+CREATE TABLE IF NOT EXISTS cache_leases (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+"""
+
+_initialized: set = set()
+_init_lock = threading.Lock()
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Host-wide cache in a WAL-mode SQLite file, one namespace per cache.
+
+    Each thread gets its own connection. `lock(key)` also takes a lease row
+    in the file so a key being computed in one worker process is waited on,
+    not recomputed, by the others. Leases expire after `lease_seconds` in
+    case their holder dies. A waiter that is still without the lease after
+    `lease_seconds` goes ahead anyway and `lock` yields False, so callers
+    that must not compute concurrently can check the flag.
+    """
+
+    def __init__(self, path: str, namespace: str, max_entries: int, lease_seconds: float = 30.0):
+        super().__init__()
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with _init_lock:
+                if self.path not in _initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # autocommit: every statement is its own short transaction
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with _init_lock:
+                if self.path not in _initialized:
+                    conn.executescript(_SCHEMA)
+                    _initialized.add(self.path)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        conn = self._conn()
+        out: Dict[str, Any] = {}
+        # stay well under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value, accessed_at FROM cache WHERE ns = ? AND key IN ({marks}) AND expires_at > ?",
+                (self.namespace, *chunk, now),
+            ).fetchall()
+            stale: List[str] = []
+            for key, value, accessed_at in rows:
+                try:
+                    out[key] = json.loads(value)
+                except ValueError:
+                    continue
+                if accessed_at < now - _TOUCH_INTERVAL:
+                    stale.append(key)
+            if stale:
+                conn.execute(
+                    f"UPDATE cache SET accessed_at = ? WHERE ns = ? AND key IN ({','.join('?' * len(stale))})",
+                    (now, self.namespace, *stale),
+                )
+        return out
+
+    def set_many(self, items: Dict[str, Any], ttl: float) -> None:
+        if self.max_entries <= 0 or not items:
+            return
+        now = time.time()
+        rows = [
+            (self.namespace, key, json.dumps(value, ensure_ascii=False), now + ttl, now)
+            for key, value in items.items()
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (ns, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM cache WHERE ns = ? AND expires_at <= ?", (self.namespace, now))
+        conn.execute(
+            "DELETE FROM cache WHERE ns = ? AND key IN ("
+            " SELECT key FROM cache WHERE ns = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE ns = ? AND key = ?", (self.namespace, key))
+
+    def expires_at(self, key: str) -> Optional[float]:
+        row = self._conn().execute(
+            "SELECT expires_at FROM cache WHERE ns = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def clear(self) -> int:
+        return self._conn().execute("DELETE FROM cache WHERE ns = ?", (self.namespace,)).rowcount
+
+    def size(self) -> int:
+        row = self._conn().execute("SELECT COUNT(*) FROM cache WHERE ns = ?", (self.namespace,)).fetchone()
+        return int(row[0])
+
+    # ---- cross-process leases ----
+    def _try_lease(self, key: str, owner: str) -> bool:
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO cache_leases (ns, key, owner, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(ns, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE cache_leases.expires_at <= ?",
+            (self.namespace, key, owner, now + self.lease_seconds, now),
+        )
+        return cur.rowcount > 0
+
+    def _release_lease(self, key: str, owner: str) -> None:
+        self._conn().execute(
+            "DELETE FROM cache_leases WHERE ns = ? AND key = ? AND owner = ?", (self.namespace, key, owner)
+        )
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[bool]:
+        with self._key_locks.hold(key):
+            owner = uuid.uuid4().hex
+            deadline = time.monotonic() + self.lease_seconds
+            # Another worker holds the lease: wait for it to finish (or expire)
+            held = self._try_lease(key, owner)
+            while not held and time.monotonic() < deadline:
+                time.sleep(0.05)
+                held = self._try_lease(key, owner)
+            try:
+                yield held
+            finally:
+                if held:
+                    self._release_lease(key, owner)
+
+
+def make_backend(namespace: str, max_entries: int) -> CacheBackend:
+    """Backend for one cache, chosen by CACHE_BACKEND ("memory" or "sqlite")."""
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(CACHE_PATH, namespace, max_entries)
+    return MemoryLRUBackend(max_entries)
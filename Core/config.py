@@ -14,6 +14,117 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip() if os.getenv("OPENAI_AP
 SEARCHAPI_KEY = os.getenv("SEARCHAPI_KEY", "").strip() if os.getenv("SEARCHAPI_KEY") else None
 
 
+def _env_int(name: str, default: int) -> int:
+    """Read an int from the environment, falling back to default on bad input."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float from the environment, falling back to default on bad input."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag (1/true/yes/on) from the environment."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in {"1", "true", "yes", "on"}
+
+
+# Logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+# Fraction of requests (0.0–1.0) whose full final state is dumped to the log
+LOG_STATE_SAMPLE_RATE = _env_float("LOG_STATE_SAMPLE_RATE", 0.0)
+# Max records buffered before new ones are dropped (never blocks the request path)
+LOG_QUEUE_SIZE = _env_int("LOG_QUEUE_SIZE", 10000)
+
+# Upstream rate limits (provider quotas). Burst = bucket capacity.
+OPENAI_RPM = _env_int("OPENAI_RPM", 500)
+OPENAI_BURST = _env_int("OPENAI_BURST", 20)
+SEARCHAPI_RPM = _env_int("SEARCHAPI_RPM", 100)
+SEARCHAPI_BURST = _env_int("SEARCHAPI_BURST", 10)
+# Callers allowed to wait per upstream before new ones are shed with 429
+RATE_LIMIT_QUEUE_SIZE = _env_int("RATE_LIMIT_QUEUE_SIZE", 64)
+# Longest a caller may wait for a token (seconds)
+RATE_LIMIT_MAX_WAIT = _env_float("RATE_LIMIT_MAX_WAIT", 10.0)
+
+# LLM completion cache (temperature=0 calls only). Size 0 disables it.
+LLM_CACHE_SIZE = _env_int("LLM_CACHE_SIZE", 1024)
+LLM_CACHE_TTL = _env_int("LLM_CACHE_TTL", 24 * 3600)
+# Bump to invalidate every cached completion (e.g. after a prompt/schema change)
+LLM_CACHE_SALT = os.getenv("LLM_CACHE_SALT", "v1")
+# Optional directory to persist completions across restarts
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "").strip() or None
+
+# Normalized search results, keyed by canonical query
+SEARCH_CACHE_SIZE = _env_int("SEARCH_CACHE_SIZE", 512)
+SEARCH_CACHE_TTL = _env_int("SEARCH_CACHE_TTL", 15 * 60)
+
+# Refresh-ahead for popular queries. Budget 0 disables the scheduler.
+# Every worker process runs its own scheduler, so the upstream cost is
+# REFRESH_BUDGET_PER_MIN x the number of workers.
+REFRESH_TOP_N = _env_int("REFRESH_TOP_N", 20)
+REFRESH_BUDGET_PER_MIN = _env_float("REFRESH_BUDGET_PER_MIN", 6.0)
+# Refresh entries this many seconds before they expire
+REFRESH_LEAD_SECONDS = _env_int("REFRESH_LEAD_SECONDS", 120)
+# Popularity counters halve every this many seconds
+POPULARITY_HALF_LIFE = _env_int("POPULARITY_HALF_LIFE", 30 * 60)
+# Minimum decayed score to be refreshed; 0.5 = at least one hit in the last half-life
+REFRESH_MIN_SCORE = _env_float("REFRESH_MIN_SCORE", 0.5)
+
+# Per-request profiling (opt-in via X-Profile header or sampling)
+PROFILE_SAMPLE_RATE = _env_float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_INTERVAL_MS = _env_float("PROFILE_INTERVAL_MS", 5.0)
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".profiles")
+PROFILE_MAX_KEEP = _env_int("PROFILE_MAX_KEEP", 50)
+# Enables /admin endpoints and header-triggered profiling; both are off while unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip() or None
+
+# "stepwise" (plan→act→observe per tool) or "fused" (one plan, one execution node)
+AGENT_EXECUTION_MODE = os.getenv("AGENT_EXECUTION_MODE", "stepwise").strip().lower()
+
+# Price watches: SQLite store and poll interval in seconds (0 disables the poller)
+PRICE_WATCH_DB = os.getenv("PRICE_WATCH_DB", ".data/price_watch.db")
+PRICE_WATCH_INTERVAL = _env_int("PRICE_WATCH_INTERVAL", 30 * 60)
+
+# CPU offload: worker processes (0 = always run inline) and the page size
+# above which product-page parsing moves to them
+CPU_POOL_WORKERS = _env_int("CPU_POOL_WORKERS", 2)
+CPU_OFFLOAD_HTML_KB = _env_int("CPU_OFFLOAD_HTML_KB", 256)
+
+# Cache storage: "memory" (per process) or "sqlite" (one file shared by all workers on the host)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").strip().lower()
+CACHE_PATH = os.getenv("CACHE_PATH", ".data/cache.db")
+# Extracted product-page specs, keyed by URL
+PAGE_CACHE_SIZE = _env_int("PAGE_CACHE_SIZE", 2048)
+PAGE_CACHE_TTL = _env_int("PAGE_CACHE_TTL", 6 * 3600)
+
+# Micro-batching of concurrent intent-analysis calls (opt-in)
+INTENT_BATCH_ENABLED = _env_bool("INTENT_BATCH_ENABLED", False)
+INTENT_BATCH_WINDOW_MS = _env_float("INTENT_BATCH_WINDOW_MS", 5.0)
+INTENT_BATCH_MAX_SIZE = _env_int("INTENT_BATCH_MAX_SIZE", 8)
+
+# Async rank jobs: SQLite job table, worker threads, queued-job cap and result TTL (seconds)
+RANK_JOBS_DB = os.getenv("RANK_JOBS_DB", ".data/rank_jobs.db")
+RANK_JOB_WORKERS = _env_int("RANK_JOB_WORKERS", 4)
+RANK_JOB_QUEUE_SIZE = _env_int("RANK_JOB_QUEUE_SIZE", 256)
+RANK_JOB_TTL = _env_int("RANK_JOB_TTL", 24 * 3600)
+
+# Final /rank responses, keyed by (canonical query, trusted_only, execution mode). Size 0 disables it.
+RANK_CACHE_SIZE = _env_int("RANK_CACHE_SIZE", 512)
+RANK_CACHE_TTL = _env_int("RANK_CACHE_TTL", 5 * 60)
+
+# Dominated offers within this % of the price of the offer that beats them still go to the LLM ranker
+RANK_NEAR_FRONTIER_PCT = _env_float("RANK_NEAR_FRONTIER_PCT", 5.0)
+
+
 def get_openai_client() -> OpenAI:
     """Return a shared OpenAI client. Raises if API key is missing."""
     if not OPENAI_API_KEY:
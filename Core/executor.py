@@ -0,0 +1,139 @@
+# app/core/executor.py
+"""
+CPU offload for heavy pipeline stages, plus event-loop lag measurement.
+
+`run_cpu` sends a stage to a worker process pool when its input is large
+(size >= threshold) and runs it inline otherwise, where the pickling round
+trip would cost more than it saves. Stage functions must be module-level,
+picklable and side-effect free: they get copies of their inputs and only
+their return value comes back. Today only product-page spec extraction is
+big enough to use it (see CPU_OFFLOAD_HTML_KB); offer normalization of a
+40-result search takes ~0.2 ms inline against ~10 ms through the pool.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from Core.config import CPU_POOL_WORKERS
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+offload_stats: Dict[str, int] = {"offloaded": 0, "inline": 0}
+_stats_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs threads is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=CPU_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _noop() -> None:
+    return None
+
+
+def warm_pool() -> None:
+    """Start the worker processes now so the first large input doesn't pay spawn + import cost."""
+    pool = _get_pool()
+    if pool is not None:
+        for _ in range(CPU_POOL_WORKERS):
+            pool.submit(_noop)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_cpu(fn: Callable[..., T], *args: Any, size: float = 0, threshold: float = 0) -> T:
+    """Run fn(*args) in the process pool if size >= threshold > 0, else inline (blocking)."""
+    pool = _get_pool() if threshold > 0 and size >= threshold else None
+    with _stats_lock:
+        offload_stats["inline" if pool is None else "offloaded"] += 1
+    if pool is None:
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+
+def dumps_json(obj: Any) -> str:
+    """Compact JSON encoding used for NDJSON lines and cached response bodies."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a fixed sleep."""
+
+    def __init__(self, interval: float = 0.25, window: float = 60.0):
+        self.interval = interval
+        self.window = window
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+        self._window_max = 0.0
+        self._window_started = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def _record(self, lag_ms: float) -> None:
+        self.last_ms = lag_ms
+        self.avg_ms = 0.9 * self.avg_ms + 0.1 * lag_ms
+        self._window_max = max(self._window_max, lag_ms)
+        now = time.monotonic()
+        if now - self._window_started >= self.window:
+            self.max_ms = self._window_max
+            self._window_max = 0.0
+            self._window_started = now
+        else:
+            self.max_ms = max(self.max_ms, self._window_max)
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self._record(max(0.0, (loop.time() - started - self.interval) * 1000))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        with _stats_lock:
+            counts = dict(offload_stats)
+        return {
+            "lag_last_ms": round(self.last_ms, 2),
+            "lag_avg_ms": round(self.avg_ms, 2),
+            "lag_max_ms": round(self.max_ms, 2),
+            **counts,
+        }
+
+
+loop_lag = LoopLagMonitor()
@@ -0,0 +1,126 @@
+# app/core/json_stream.py
+"""
+Incremental extraction of array elements from chunked JSON text.
+
+`iter_array_items(chunks, key)` walks a top-level JSON object as text
+arrives and yields each element of `obj[key]` (a list) as soon as that
+element is complete. Other top-level values are decoded one at a time and
+discarded, so the whole document is never held in memory, and reading
+stops as soon as the target array closes.
+`iter_decoded` turns raw HTTP byte chunks into text chunks for it.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Optional
+
+_decoder = json.JSONDecoder()
+_WS = " \t\r\n"
+_NUMBER_TAIL = "0123456789.eE+-"
+
+
+class _Buffer:
+    """Sliding text window over an iterator of chunks."""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        """Pull the next chunk, dropping already-consumed text. False at EOF."""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                self.text = self.text[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def peek(self) -> Optional[str]:
+        """Next non-whitespace char (consuming the whitespace), or None at EOF."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                return None
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if ch is None or ch not in chars:
+            raise ValueError(f"Malformed JSON stream: expected one of {chars!r}, got {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self, lazy: bool = False) -> Any:
+        """
+        Decode one complete JSON value at the cursor, reading more text as needed.
+
+        With lazy=True an incomplete decode is retried only once the pending
+        text has doubled, so a large value spread over many chunks costs O(n)
+        instead of one full re-decode per chunk (it just completes later).
+        """
+        self.peek()
+        retry_at = 0
+        while True:
+            pending = len(self.text) - self.pos
+            if pending < retry_at and not self.eof:
+                self.more()
+                continue
+            try:
+                val, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.more():
+                    raise
+                if lazy:
+                    retry_at = 2 * pending
+                continue
+            # A number at the very end of the window may still be growing
+            # (including a cut right after its ".", "e" or sign)
+            if (
+                isinstance(val, (int, float)) and not isinstance(val, bool) and not self.eof
+                and not self.text[end:].strip(_NUMBER_TAIL) and self.more()
+            ):
+                continue
+            self.pos = end
+            return val
+
+
+def iter_array_items(chunks: Iterable[str], key: str) -> Iterator[Any]:
+    """Yield elements of the top-level array `key` as they complete."""
+    buf = _Buffer(chunks)
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+    while True:
+        name = buf.value()
+        buf.expect(":")
+        if name == key and buf.peek() == "[":
+            buf.pos += 1
+            if buf.peek() == "]":
+                return
+            while True:
+                yield buf.value()
+                if buf.expect(",]") == "]":
+                    return
+        buf.value(lazy=True)  # unrelated value, discarded
+        if buf.expect(",}") == "}":
+            return
+
+
+def iter_decoded(byte_chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Decode byte chunks to text, carrying multi-byte characters split across chunks."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
@@ -0,0 +1,220 @@
+# app/core/llm.py
+"""
+Content-addressed cache for deterministic (temperature=0) chat completions.
+
+Entries are keyed on sha256(salt, model, system prompt, user content), kept
+in a bounded cache backend with a TTL (per-process LRU, or SQLite shared by
+all workers; see Core.cache_backends), and optionally persisted to disk as
+one small JSON file per key.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from Core.config import client, LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_SALT, LLM_CACHE_DIR
+from Core.cache_backends import CacheBackend, make_backend
+from Core.ratelimit import limiter
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+class CompletionCache:
+    """Cache of completion texts on a pluggable backend, with hit/token accounting."""
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_SIZE,
+        ttl: int = LLM_CACHE_TTL,
+        salt: str = LLM_CACHE_SALT,
+        persist_dir: Optional[str] = LLM_CACHE_DIR,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.salt = salt
+        self.persist_dir = persist_dir
+        # key -> {"content": str, "tokens": int}
+        self.backend = backend or make_backend("completions", max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, model: str, system: str, user: str) -> str:
+        h = hashlib.sha256()
+        for part in (self.salt, model, system, user):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    # ---- disk persistence ----
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir or "", key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Tuple[str, int, float]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            return raw["content"], int(raw.get("tokens", 0)), float(raw["expires_at"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store(self, key: str, entry: Tuple[str, int, float]) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"content": entry[0], "tokens": entry[1], "expires_at": entry[2]}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # persistence is best-effort
+
+    # ---- public API ----
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        entry = self.backend.get(key)
+        if entry is None and self.persist_dir:
+            loaded = self._load(key)
+            remaining = loaded[2] - time.time() if loaded else 0
+            if remaining > 0:
+                entry = {"content": loaded[0], "tokens": loaded[1]}
+                self.backend.set(key, entry, remaining)
+        return entry
+
+    def peek(self, key: str) -> Optional[str]:
+        """Like get, without counting towards hit/miss stats."""
+        entry = self._lookup(key)
+        return entry["content"] if entry else None
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        entry = self._lookup(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.tokens_saved += entry["tokens"]
+        return entry["content"]
+
+    def put(self, key: str, content: str, tokens: int = 0) -> None:
+        if not self.enabled:
+            return
+        self.backend.set(key, {"content": content, "tokens": tokens}, self.ttl)
+        if self.persist_dir:
+            self._store(key, (content, tokens, time.time() + self.ttl))
+
+    def lock(self, key: str):
+        """Per-key lock so concurrent misses (threads, or workers with a shared backend) call the LLM once."""
+        return self.backend.lock(key)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self.backend.size()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "tokens_saved": self.tokens_saved,
+            }
+
+
+completion_cache = CompletionCache()
+
+
+def _messages(system: str, user: str) -> list:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+def chat_json(system: str, user: str, model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    """Run a temperature=0 JSON-mode chat completion, served from cache when possible."""
+    key = completion_cache.key(model, system, user)
+    content = completion_cache.get(key)
+    if content is None:
+        # Identical concurrent misses wait for one completion instead of all calling OpenAI
+        with completion_cache.lock(key):
+            content = completion_cache.peek(key)
+            if content is None:
+                limiter.acquire("openai")
+                resp = client.chat.completions.create(
+                    model=model,
+                    temperature=0,
+                    response_format={"type": "json_object"},
+                    messages=_messages(system, user),
+                )
+                content = resp.choices[0].message.content
+                usage = getattr(resp, "usage", None)
+                data = json.loads(content)  # only cache parseable output
+                completion_cache.put(key, content, int(getattr(usage, "total_tokens", 0) or 0))
+                return data
+    return json.loads(content)
+
+
+def chat_json_stream(system: str, user: str, model: str = DEFAULT_MODEL) -> Iterator[str]:
+    """
+    Streamed variant of chat_json: yields raw text deltas as they arrive.
+
+    A cache hit yields the whole completion at once. The completion is only
+    cached once the stream has been fully consumed and parses as JSON. The
+    per-key lock is held while streaming, so identical concurrent requests
+    wait and then get the cached completion; it is released when the
+    generator finishes or is closed.
+    """
+    key = completion_cache.key(model, system, user)
+    content = completion_cache.get(key)
+    if content is None:
+        with completion_cache.lock(key):
+            content = completion_cache.peek(key)
+            if content is None:
+                yield from _stream_completion(key, system, user, model)
+                return
+    yield content
+
+
+def _stream_completion(key: str, system: str, user: str, model: str) -> Iterator[str]:
+    limiter.acquire("openai")
+    stream = client.chat.completions.create(
+        model=model,
+        temperature=0,
+        response_format={"type": "json_object"},
+        messages=_messages(system, user),
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    parts: list = []
+    tokens = 0
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            tokens = int(getattr(usage, "total_tokens", 0) or 0)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    content = "".join(parts)
+    try:
+        json.loads(content)
+    except ValueError:
+        return
+    completion_cache.put(key, content, tokens)
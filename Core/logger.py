@@ -0,0 +1,138 @@
+# app/core/logger.py
+"""
+Structured, non-blocking logging.
+
+Log calls on the request path only push the raw record onto an in-memory
+queue; a background listener thread formats it as compact JSON and writes
+it to stdout. Every record carries the current request id.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from Core.config import LOG_LEVEL, LOG_STATE_SAMPLE_RATE, LOG_QUEUE_SIZE
+
+ROOT_LOGGER_NAME = "salla"
+
+# Set per request (see main.py middleware) and stamped on every record
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def new_request_id() -> str:
+    """Return a fresh opaque request id."""
+    return uuid.uuid4().hex
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single-line JSON object. Dict messages are merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+        }
+        if isinstance(record.msg, dict):
+            payload.update(record.msg)
+        else:
+            payload["message"] = record.getMessage()
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class _RequestIdFilter(logging.Filter):
+    """Attach the current request id while still on the caller's thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that skips formatting on the caller thread and never blocks.
+
+    The stock handler formats the message in prepare(); we leave that to the
+    listener so serialization cost is paid off the request path. Records are
+    dropped (and counted) if the queue is full.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DeferredQueueHandler.dropped += 1
+
+
+def configure_logging() -> None:
+    """Install the queue handler and start the background writer (idempotent)."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max(LOG_QUEUE_SIZE, 1))
+
+        sink = logging.StreamHandler(sys.stdout)
+        sink.setFormatter(JsonFormatter())
+
+        handler = _DeferredQueueHandler(q)
+        handler.addFilter(_RequestIdFilter())
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.addHandler(handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(q, sink, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush pending records and stop the background writer."""
+    global _listener
+    with _configure_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a namespaced logger, configuring the pipeline on first use."""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def should_sample_state() -> bool:
+    """Decide whether this request's full state should be dumped."""
+    rate = LOG_STATE_SAMPLE_RATE
+    if rate <= 0.0:
+        return False
+    return rate >= 1.0 or random.random() < rate
+
+
+def dropped_records() -> int:
+    """Number of records dropped because the log queue was full."""
+    return _DeferredQueueHandler.dropped
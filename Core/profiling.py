@@ -0,0 +1,203 @@
+# app/core/profiling.py
+"""
+On-demand per-request profiling.
+
+When a request is selected (X-Profile header or PROFILE_SAMPLE_RATE), the
+work it runs is wrapped in `profile_request`, which captures:
+- a sampling CPU profile of the executing thread (collapsed stacks, ready
+  for flamegraph tools), and
+- tracemalloc snapshots before/after, reported as the top allocation sites.
+
+Results are written to PROFILE_DIR/<request_id>/. When profiling is not
+requested the only cost is one context-variable lookup.
+
+tracemalloc is process-wide: its snapshots and peak also count allocations
+made by other requests running at the same time. To keep profiles from
+resetting each other's peak, only one request is profiled at a time; a
+request selected while another profile is running runs unprofiled. Only
+work that reaches `profile_request` is profiled, so a /rank served from the
+response cache leaves no profile.
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from Core.config import PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_DIR, PROFILE_MAX_KEEP
+
+# Set by the HTTP middleware for requests selected for profiling
+profile_enabled: ContextVar[bool] = ContextVar("profile_enabled", default=False)
+
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+# Held by the one request currently being profiled
+_active_profile = threading.Lock()
+
+
+def should_profile_sampled() -> bool:
+    rate = PROFILE_SAMPLE_RATE
+    return rate > 0.0 and (rate >= 1.0 or random.random() < rate)
+
+
+class SamplingProfiler:
+    """Periodically samples one thread's stack via sys._current_frames()."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id
+        self.interval = max(interval, 0.001)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            parts: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(parts))] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _profile_path(request_id: str) -> str:
+    # request ids may be client supplied; keep them to a safe file name
+    safe = "".join(ch for ch in request_id if ch.isalnum() or ch in "-_")[:64] or "unknown"
+    return os.path.join(PROFILE_DIR, safe)
+
+
+def _prune_old() -> None:
+    try:
+        entries = sorted(
+            (os.path.join(PROFILE_DIR, d) for d in os.listdir(PROFILE_DIR)),
+            key=os.path.getmtime,
+        )
+    except OSError:
+        return
+    for path in entries[: max(len(entries) - PROFILE_MAX_KEEP, 0)]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def profile_request(request_id: str, label: str = "") -> Iterator[bool]:
+    """
+    Profile the enclosed block (CPU samples + allocations) and save it under
+    request_id. Yields False, and saves nothing, if another profile is running.
+    """
+    if not _active_profile.acquire(blocking=False):
+        yield False
+        return
+    try:
+        with _profile(request_id, label):
+            yield True
+    finally:
+        _active_profile.release()
+
+
+@contextmanager
+def _profile(request_id: str, label: str) -> Iterator[None]:
+    _start_tracemalloc()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    profiler = SamplingProfiler(threading.get_ident())
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        duration = time.perf_counter() - started
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        _stop_tracemalloc()
+
+        top = after.compare_to(before, "lineno")[:30]
+        out_dir = _profile_path(request_id)
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, "cpu.folded"), "w", encoding="utf-8") as f:
+            f.write(profiler.folded())
+        with open(os.path.join(out_dir, "memory.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(str(stat) for stat in top))
+        with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "request_id": request_id,
+                "label": label,
+                "created_at": time.time(),
+                "duration_ms": round(duration * 1000, 1),
+                "cpu_samples": profiler.samples,
+                "interval_ms": profiler.interval * 1000,
+                "traced_current_bytes": current,
+                "traced_peak_bytes": peak,
+            }, f)
+        _prune_old()
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadata of saved profiles, newest first."""
+    out: List[Dict[str, Any]] = []
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except OSError:
+        return out
+    for name in names:
+        meta = load_profile(name, include_data=False)
+        if meta:
+            out.append(meta)
+    out.sort(key=lambda m: -m.get("created_at", 0))
+    return out
+
+
+def load_profile(request_id: str, include_data: bool = True) -> Optional[Dict[str, Any]]:
+    """Load a saved profile (metadata plus, optionally, top stacks and allocations)."""
+    out_dir = _profile_path(request_id)
+    try:
+        with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if include_data:
+            with open(os.path.join(out_dir, "cpu.folded"), "r", encoding="utf-8") as f:
+                meta["cpu_folded"] = f.read()
+            with open(os.path.join(out_dir, "memory.txt"), "r", encoding="utf-8") as f:
+                meta["top_allocations"] = f.read().splitlines()
+    except (OSError, ValueError):
+        return None
+    return meta
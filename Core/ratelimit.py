@@ -0,0 +1,162 @@
+# app/core/ratelimit.py
+"""
+Process-wide admission control for upstream APIs.
+
+Each upstream (OpenAI, SearchAPI) gets a token bucket sized from its quota.
+Callers that cannot get a token immediately wait in a bounded priority
+queue (interactive traffic ahead of batch traffic). When the queue is full,
+or the expected wait exceeds the caller's budget, the call is shed at once
+with RateLimitExceeded so the API can answer 429 + Retry-After.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from Core.config import (
+    OPENAI_RPM,
+    OPENAI_BURST,
+    SEARCHAPI_RPM,
+    SEARCHAPI_BURST,
+    RATE_LIMIT_QUEUE_SIZE,
+    RATE_LIMIT_MAX_WAIT,
+)
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run a block with the given upstream priority (e.g. PRIORITY_BATCH)."""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when an upstream call is shed instead of queued."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"{upstream} rate limit exceeded; retry after {self.retry_after}s")
+
+
+class TokenBucket:
+    """Thread-safe token bucket with a bounded priority wait queue."""
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_sec: float,
+        capacity: int,
+        max_queue: int = RATE_LIMIT_QUEUE_SIZE,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+    ):
+        self.name = name
+        self.rate = max(rate_per_sec, 1e-6)
+        self.capacity = max(capacity, 1)
+        self.max_queue = max(max_queue, 0)
+        self.max_wait = max_wait
+
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int]] = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.shed = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _eta(self, ahead: int) -> float:
+        """Seconds until a caller with `ahead` waiters in front of it gets a token."""
+        return max(0.0, (ahead + 1 - self._tokens) / self.rate)
+
+    def _shed(self, ahead: int) -> RateLimitExceeded:
+        self.shed += 1
+        return RateLimitExceeded(self.name, self._eta(ahead))
+
+    def acquire(self, prio: Optional[int] = None, timeout: Optional[float] = None) -> None:
+        """Take one token, waiting (bounded) if needed. Raises RateLimitExceeded."""
+        prio = request_priority.get() if prio is None else prio
+        budget = self.max_wait if timeout is None else timeout
+
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if not self._waiters and self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+            ahead = sum(1 for p, _ in self._waiters if p <= prio)
+            if len(self._waiters) >= self.max_queue or self._eta(ahead) > budget:
+                raise self._shed(ahead)
+
+            deadline = now + budget
+            entry = (prio, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_head = self._waiters[0] == entry
+                    if is_head and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        entry = None
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._shed(len(self._waiters) - 1)
+                    wait = min(remaining, (1 - self._tokens) / self.rate) if is_head else remaining
+                    self._cond.wait(wait)
+            finally:
+                if entry is not None:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                # Wake the (possibly new) head so it can re-check
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self._tokens, 2),
+                "waiting": len(self._waiters),
+                "shed": self.shed,
+            }
+
+
+class UpstreamLimiter:
+    """Registry of token buckets keyed by upstream name."""
+
+    def __init__(self, buckets: Dict[str, TokenBucket]):
+        self._buckets = buckets
+
+    def acquire(self, upstream: str, prio: Optional[int] = None, timeout: Optional[float] = None) -> None:
+        bucket = self._buckets.get(upstream)
+        if bucket is not None:
+            bucket.acquire(prio, timeout)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: b.stats() for name, b in self._buckets.items()}
+
+
+limiter = UpstreamLimiter({
+    "openai": TokenBucket("openai", OPENAI_RPM / 60.0, OPENAI_BURST),
+    "searchapi": TokenBucket("searchapi", SEARCHAPI_RPM / 60.0, SEARCHAPI_BURST),
+})
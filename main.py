@@ -4,12 +4,25 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Any, Dict
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 
 from Core.config import OPENAI_API_KEY, SEARCHAPI_KEY
+from Core.logger import new_request_id, request_id_var
+from Core.profiling import profile_enabled, should_profile_sampled
+from Core.executor import loop_lag, warm_pool, shutdown_pool
+from Core.ratelimit import limiter
+from Core.llm import completion_cache
+from Agent.intent import intent_batcher
+from Agent.search_cache import offer_cache
+from Agent.refresh import refresh_scheduler
+from Agent.price_watch import price_watch_poller
+from API.rank_jobs import rank_jobs
+from API.response_cache import response_cache
 from API.routes_rank import router as rank_router
+from API.routes_admin import router as admin_router, is_admin_token
+from API.routes_watch import router as watch_router
 
 
 app = FastAPI(
@@ -28,6 +41,46 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """
+    Tag each request with an id (client-supplied or generated) for log
+    correlation, and mark it for profiling when asked via X-Profile (must
+    equal ADMIN_TOKEN; ignored while none is configured) or picked by sampling.
+    """
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id_var.set(request_id)
+
+    wants_profile = is_admin_token(request.headers.get("X-Profile"))
+    profile_token = profile_enabled.set(True) if wants_profile or should_profile_sampled() else None
+    try:
+        response = await call_next(request)
+    finally:
+        if profile_token is not None:
+            profile_enabled.reset(profile_token)
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    loop_lag.start()
+    warm_pool()
+    refresh_scheduler.start()
+    price_watch_poller.start()
+    rank_jobs.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks() -> None:
+    rank_jobs.stop()
+    await refresh_scheduler.stop()
+    await price_watch_poller.stop()
+    await loop_lag.stop()
+    shutdown_pool()
+
+
 @app.get("/health")
 def health_check() -> Dict[str, Any]:
     """Simple health check endpoint."""
@@ -61,6 +114,15 @@ def health_check() -> Dict[str, Any]:
             "searchapi": bool(SEARCHAPI_KEY),
         },
         "searchapi_key_info": key_info if SEARCHAPI_KEY else None,
+        "rate_limits": limiter.stats(),
+        "llm_cache": completion_cache.stats(),
+        "intent_batch": intent_batcher.stats(),
+        "search_cache": offer_cache.stats(),
+        "rank_cache": response_cache.stats(),
+        "refresh": refresh_scheduler.stats(),
+        "price_watch": price_watch_poller.last_cycle,
+        "rank_jobs": rank_jobs.stats(),
+        "event_loop": loop_lag.stats(),
     }
 
 
@@ -82,3 +144,5 @@ async def test_page() -> HTMLResponse:
 
 # Register v1 routes
 app.include_router(rank_router)
+app.include_router(admin_router)
+app.include_router(watch_router)
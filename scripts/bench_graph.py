@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark graph overhead: stepwise vs fused execution.
+
+Network tools and LLM calls are replaced with in-memory fakes so the numbers
+reflect LangGraph supersteps, state copying and the CPU-only normalizers.
+
+    python scripts/bench_graph.py --runs 200 --offers 40
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+
+import Agent.graph as graph  # noqa: E402
+
+
+def _fake_offers(n: int) -> List[Dict[str, Any]]:
+    retailers = ["Jarir", "Noon.com", "Amazon.sa", "Some Shop"]
+    conditions = ["new", "Used", "refurbished", ""]
+    return [
+        {
+            "name": f"Apple iPhone 15 Pro {'256GB' if i % 2 else ''} Natural Titanium #{i}",
+            "price": 4000.0 + i * 13,
+            "currency": "SAR",
+            "retailer": retailers[i % len(retailers)],
+            "link": f"https://example.com/p/{i % (n - 2) if n > 2 else i}",
+            "image": None,
+            "condition": conditions[i % len(conditions)],
+            "source": "bench",
+        }
+        for i in range(n)
+    ]
+
+
+def _install_fakes(n_offers: int) -> None:
+    offers = _fake_offers(n_offers)
+    graph.analyze_intent = lambda q: {
+        "ready": True, "search_query": q, "category": "", "must_have": [], "nice_to_have": [],
+        "budget_min": None, "budget_max": None, "follow_up_question": None,
+    }
+    graph.cached_offers = lambda query, limit=40: [dict(o) for o in offers[:limit]]
+    graph.product_page_fetch = lambda url: {"ok": True, "model": None, "storage": None}
+    graph.llm_rank_offers = lambda offers, q, intent, trusted_only=False, top_k=4: {
+        "items": [
+            {"name": o["name"], "price": o.get("price_sar", o["price"]), "currency": "SAR",
+             "retailer": o["retailer"], "link": o["link"], "reason": "bench"}
+            for o in offers[:top_k]
+        ],
+        "notes": None,
+    }
+
+
+def _bench(mode: str, runs: int) -> Dict[str, float]:
+    app = graph.build_app(mode)
+
+    def init() -> Dict[str, Any]:
+        # fresh lists every run: stepwise nodes mutate state in place
+        return {
+            "query": "iPhone 15 Pro 256GB", "offers": [], "missing": [], "tried_tools": [],
+            "steps": 0, "done": False, "errors": [], "trusted_only": True,
+        }
+
+    for _ in range(5):  # warm-up
+        list(app.stream(init(), stream_mode="values"))
+
+    timings: List[float] = []
+    supersteps = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        supersteps = sum(1 for _ in app.stream(init(), stream_mode="values")) - 1
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return {
+        "supersteps": supersteps,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--offers", type=int, default=40)
+    args = parser.parse_args()
+
+    _install_fakes(args.offers)
+    print(f"{'mode':<10}{'steps':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode in ("stepwise", "fused"):
+        r = _bench(mode, args.runs)
+        print(f"{mode:<10}{r['supersteps']:>7}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Bulk ranking: run many queries through the agent offline.
+
+Reads JSONL ({"query": ..., "trusted_only": true, "id": optional}), ranks the
+queries on a pool of worker processes with a few threads each, and appends
+results to JSONL or CSV as they finish. Finished ids go to a checkpoint file,
+so re-running the same command resumes where it stopped. Failures are written
+to <out>.errors.jsonl and retried on the next run.
+
+    python scripts/bulk_rank.py skus.jsonl --out ranked.csv --processes 4 --concurrency 4
+
+Upstream rate limits (OPENAI_RPM/BURST, SEARCHAPI_RPM/BURST) are the budget
+for the whole run and are split evenly across the processes. Set
+CACHE_BACKEND=sqlite to share search/LLM caches between them.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, IO, List, Optional, Set
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CSV_FIELDS = [
+    "id", "query", "trusted_only", "position", "name", "price", "currency",
+    "retailer", "condition", "link", "reason", "notes", "needs_more_info",
+]
+_RATE_LIMIT_DEFAULTS = {"OPENAI_RPM": 500, "OPENAI_BURST": 20, "SEARCHAPI_RPM": 100, "SEARCHAPI_BURST": 10}
+
+
+def item_id(item: Dict[str, Any]) -> str:
+    """Stable id for checkpointing: the input id, else a hash of the query and flags."""
+    if item.get("id") is not None:
+        return str(item["id"])
+    raw = f"{item['query']}\0{int(bool(item.get('trusted_only', True)))}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def read_items(path: str, default_trusted: bool) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                print(f"skipping line {lineno}: not JSON", file=sys.stderr)
+                continue
+            if isinstance(raw, str):
+                raw = {"query": raw}
+            if not isinstance(raw, dict) or not raw.get("query"):
+                print(f"skipping line {lineno}: no query", file=sys.stderr)
+                continue
+            raw.setdefault("trusted_only", default_trusted)
+            raw["id"] = item_id(raw)
+            items.append(raw)
+    return items
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+
+# -----------------------------
+# Worker processes
+# -----------------------------
+def _rank_item(item: Dict[str, Any], retries: int) -> Dict[str, Any]:
+    from fastapi import HTTPException
+    from fastapi.encoders import jsonable_encoder
+    from API.rank_service import rank
+    from API.schemas import RankRequest
+
+    payload = RankRequest(query=item["query"], trusted_only=bool(item["trusted_only"]))
+    started = time.perf_counter()
+    error = "not attempted"
+    for attempt in range(retries + 1):
+        try:
+            response = rank(payload)
+            return {
+                "id": item["id"], "ok": True, "response": jsonable_encoder(response),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+        except HTTPException as e:
+            error = f"{e.status_code}: {e.detail}"
+            if e.status_code != 429 or attempt == retries:
+                break
+            time.sleep(float((e.headers or {}).get("Retry-After", 1)))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            break
+    return {
+        "id": item["id"], "ok": False, "error": error,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def worker_main(tasks: Any, results: Any, concurrency: int, retries: int) -> None:
+    """Process entry point: `concurrency` threads pull items until they see None."""
+    os.chdir(ROOT)
+
+    def loop() -> None:
+        while True:
+            item = tasks.get()
+            if item is None:
+                return
+            results.put(_rank_item(item, retries))
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def _worker_env(processes: int, mode: Optional[str]) -> Dict[str, str]:
+    """Env for the workers: each gets 1/processes of every upstream budget."""
+    env: Dict[str, str] = {}
+    for name, default in _RATE_LIMIT_DEFAULTS.items():
+        total = int(os.getenv(name, default))
+        env[name] = str(max(total // processes, 1))
+    env["LOG_LEVEL"] = os.getenv("LOG_LEVEL", "WARNING")
+    # queries are already parallel across processes; no nested CPU pool
+    env["CPU_POOL_WORKERS"] = os.getenv("CPU_POOL_WORKERS", "0")
+    # offline: wait for tokens instead of shedding with 429
+    env["RATE_LIMIT_MAX_WAIT"] = os.getenv("RATE_LIMIT_MAX_WAIT", "300")
+    if mode:
+        env["AGENT_EXECUTION_MODE"] = mode
+    return env
+
+
+# -----------------------------
+# Output
+# -----------------------------
+class ResultWriter:
+    """Appends finished results (JSONL or CSV) and their ids to the checkpoint."""
+
+    def __init__(self, out_path: str, fmt: str, checkpoint_path: str, errors_path: str):
+        self.fmt = fmt
+        new_file = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+        self.out: IO[str] = open(out_path, "a", encoding="utf-8", newline="")
+        self.checkpoint: IO[str] = open(checkpoint_path, "a", encoding="utf-8")
+        self.errors: IO[str] = open(errors_path, "w", encoding="utf-8")
+        self.csv = csv.DictWriter(self.out, fieldnames=CSV_FIELDS) if fmt == "csv" else None
+        if self.csv is not None and new_file:
+            self.csv.writeheader()
+
+    def write(self, item: Dict[str, Any], result: Dict[str, Any]) -> None:
+        if not result["ok"]:
+            self.errors.write(json.dumps({**item, "error": result["error"]}, ensure_ascii=False) + "\n")
+            self.errors.flush()
+            return
+        response = result["response"]
+        if self.csv is None:
+            self.out.write(json.dumps({
+                "id": item["id"], "query": item["query"], "trusted_only": item["trusted_only"],
+                "duration_ms": result["duration_ms"], "response": response,
+            }, ensure_ascii=False) + "\n")
+        else:
+            base = {
+                "id": item["id"], "query": item["query"], "trusted_only": item["trusted_only"],
+                "notes": response["result"].get("notes"), "needs_more_info": response["needs_more_info"],
+            }
+            rows = [
+                {**base, "position": i, **{k: it.get(k) for k in CSV_FIELDS if k in it}}
+                for i, it in enumerate(response["result"]["items"], 1)
+            ] or [base]
+            self.csv.writerows(rows)
+        self.out.flush()
+        # after the output line: a crash in between means a duplicate row, never a lost one
+        self.checkpoint.write(item["id"] + "\n")
+        self.checkpoint.flush()
+
+    def close(self) -> None:
+        for f in (self.out, self.checkpoint, self.errors):
+            f.close()
+
+
+def report(done: int, failed: List[Dict[str, Any]], skipped: int, lost: int,
+           durations: List[float], elapsed: float) -> None:
+    durations.sort()
+    print(f"\nfinished {done}, failed {len(failed)}, skipped (checkpoint) {skipped}, not run {lost}")
+    print(f"elapsed {elapsed:.1f}s, throughput {done / elapsed if elapsed else 0.0:.2f} queries/s")
+    if durations:
+        print(
+            f"latency mean {statistics.fmean(durations):.0f} ms, "
+            f"p50 {durations[len(durations) // 2]:.0f} ms, "
+            f"p95 {durations[max(int(len(durations) * 0.95) - 1, 0)]:.0f} ms"
+        )
+    if failed:
+        print("top failures:")
+        for error, count in Counter(r["error"] for r in failed).most_common(5):
+            print(f"  {count:>5}  {error[:160]}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="JSONL file of {\"query\", \"trusted_only\"?, \"id\"?}")
+    parser.add_argument("--out", required=True, help="output file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from --out extension")
+    parser.add_argument("--checkpoint", help="default: <out>.ckpt")
+    parser.add_argument("--processes", type=int, default=min(os.cpu_count() or 2, 4))
+    parser.add_argument("--concurrency", type=int, default=4, help="threads per process")
+    parser.add_argument("--retries", type=int, default=2, help="retries on 429")
+    parser.add_argument("--mode", choices=("stepwise", "fused"), help="agent execution mode")
+    parser.add_argument("--all-retailers", action="store_true", help="default trusted_only=false")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.out.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = args.checkpoint or args.out + ".ckpt"
+    processes = max(args.processes, 1)
+    concurrency = max(args.concurrency, 1)
+    retries = max(args.retries, 0)
+
+    items = read_items(args.input, default_trusted=not args.all_retailers)
+    finished = load_checkpoint(checkpoint_path)
+    seen: Set[str] = set()
+    pending: List[Dict[str, Any]] = []
+    for it in items:
+        if it["id"] in finished or it["id"] in seen:
+            continue
+        seen.add(it["id"])
+        pending.append(it)
+    skipped = len(items) - len(pending)
+    print(f"{len(items)} queries, {skipped} already done, {len(pending)} to run "
+          f"on {processes}x{concurrency} workers", file=sys.stderr)
+    if not pending:
+        return 0
+
+    # Children are spawned fresh and read their config from the environment
+    os.environ.update(_worker_env(processes, args.mode))
+    ctx = multiprocessing.get_context("spawn")
+    tasks = ctx.Queue()
+    results = ctx.Queue()
+    for it in pending:
+        tasks.put(it)
+    for _ in range(processes * concurrency):
+        tasks.put(None)
+    workers = [
+        ctx.Process(target=worker_main, args=(tasks, results, concurrency, retries), daemon=True)
+        for _ in range(processes)
+    ]
+    for p in workers:
+        p.start()
+
+    by_id = {it["id"]: it for it in pending}
+    writer = ResultWriter(args.out, fmt, checkpoint_path, args.out + ".errors.jsonl")
+    started = time.perf_counter()
+    done = 0
+    failed: List[Dict[str, Any]] = []
+    durations: List[float] = []
+    try:
+        while done + len(failed) < len(pending):
+            try:
+                result = results.get(timeout=1.0)
+            except queue.Empty:
+                if not any(p.is_alive() for p in workers):
+                    break  # workers died; whatever is left is reported as not run
+                continue
+            writer.write(by_id[result["id"]], result)
+            if result["ok"]:
+                done += 1
+                durations.append(result["duration_ms"])
+            else:
+                failed.append(result)
+            n = done + len(failed)
+            if n % 25 == 0 or n == len(pending):
+                rate = n / (time.perf_counter() - started)
+                print(f"{n}/{len(pending)} ({len(failed)} failed, {rate:.2f}/s)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("interrupted; re-run the same command to resume", file=sys.stderr)
+    finally:
+        writer.close()
+        for p in workers:
+            if p.is_alive():
+                p.terminate()
+        for p in workers:
+            p.join()
+
+    report(done, failed, skipped, len(pending) - done - len(failed), durations, time.perf_counter() - started)
+    return 1 if failed or done + len(failed) < len(pending) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
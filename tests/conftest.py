@@ -0,0 +1,73 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Never talk to real upstreams from tests; keep caches in memory and any
+# SQLite stores or profiles in a throwaway directory
+_DATA = tempfile.mkdtemp(prefix="ksa-ranker-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "test-not-used")
+os.environ.setdefault("SEARCHAPI_KEY", "test-not-used")
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["PROFILE_DIR"] = os.path.join(_DATA, "profiles")
+os.environ["PRICE_WATCH_DB"] = os.path.join(_DATA, "price_watch.db")
+os.environ["RANK_JOBS_DB"] = os.path.join(_DATA, "rank_jobs.db")
+os.environ["CACHE_PATH"] = os.path.join(_DATA, "cache.db")
+
+
+def fake_offers() -> List[Dict[str, Any]]:
+    retailers = ["Jarir", "Noon.com", "Amazon.sa", "eXtra"]
+    return [
+        {
+            "name": f"Apple iPhone 15 Pro Max 256GB #{i}",
+            "price": 4800.0 + i * 25,
+            "currency": "SAR",
+            "retailer": retailers[i % len(retailers)],
+            "link": f"https://example.com/p/{i}",
+            "image": None,
+            "condition": "new" if i % 2 else "",
+            "source": "test",
+        }
+        for i in range(8)
+    ]
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """Fake intent, search, page fetch and ranking in the agent graph."""
+    import Agent.graph as graph
+
+    monkeypatch.setattr(graph, "analyze_intent", lambda q: {
+        "ready": True, "search_query": q, "category": "", "must_have": [], "nice_to_have": [],
+        "budget_min": None, "budget_max": None, "follow_up_question": None,
+    })
+    monkeypatch.setattr(graph, "cached_offers", lambda query, limit=40: fake_offers()[:limit])
+    monkeypatch.setattr(graph, "product_page_fetch", lambda url: {"ok": True, "model": None, "storage": None})
+    monkeypatch.setattr(graph, "llm_rank_offers", lambda offers, q, intent, trusted_only=False, top_k=4: {
+        "items": [
+            {"name": o["name"], "price": o.get("price_sar", o["price"]), "currency": "SAR",
+             "retailer": o["retailer"], "link": o["link"], "reason": "test"}
+            for o in offers[:top_k]
+        ],
+        "notes": None,
+    })
+    return graph
+
+
+@pytest.fixture
+def client(fake_agent):
+    """TestClient for the app with intent, search, page fetch and ranking faked."""
+    from fastapi.testclient import TestClient
+
+    import main
+    from API.response_cache import response_cache
+
+    response_cache.purge()
+    yield TestClient(main.app)
+    response_cache.purge()
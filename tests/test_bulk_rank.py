@@ -0,0 +1,47 @@
+# tests/test_bulk_rank.py
+import importlib.util
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import API.rank_service as rank_service
+
+_spec = importlib.util.spec_from_file_location(
+    "bulk_rank", os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "bulk_rank.py")
+)
+bulk_rank = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bulk_rank)
+
+ITEM = {"id": "1", "query": "iPhone 15 Pro Max 256GB", "trusted_only": True}
+
+
+@pytest.fixture
+def throttled(monkeypatch):
+    calls = []
+
+    def rank(payload):
+        calls.append(payload.query)
+        raise HTTPException(status_code=429, detail="slow down", headers={"Retry-After": "0"})
+
+    monkeypatch.setattr(rank_service, "rank", rank)
+    return calls
+
+
+@pytest.mark.parametrize("retries, attempts", [(0, 1), (2, 3)])
+def test_retries_on_429(throttled, retries, attempts):
+    result = bulk_rank._rank_item(ITEM, retries)
+    assert result["ok"] is False
+    assert result["error"] == "429: slow down"
+    assert len(throttled) == attempts
+
+
+def test_negative_retries_do_not_crash(throttled):
+    result = bulk_rank._rank_item(ITEM, -1)
+    assert result["ok"] is False
+
+
+def test_item_id_is_stable():
+    assert bulk_rank.item_id({"query": "q"}) == bulk_rank.item_id({"query": "q", "trusted_only": True})
+    assert bulk_rank.item_id({"query": "q", "trusted_only": False}) != bulk_rank.item_id({"query": "q"})
+    assert bulk_rank.item_id({"query": "q", "id": 7}) == "7"
@@ -0,0 +1,134 @@
+# tests/test_cache_backends.py
+import threading
+import time
+
+import pytest
+
+import Core.cache_backends as cache_backends
+from Core.cache_backends import CacheBackend, MemoryLRUBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make(request, tmp_path):
+    def factory(max_entries=8, namespace="test"):
+        if request.param == "memory":
+            return MemoryLRUBackend(max_entries)
+        return SQLiteBackend(str(tmp_path / "cache.db"), namespace, max_entries)
+
+    return factory
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+def test_set_get_and_delete(make):
+    b = make()
+    b.set("a", {"x": [1, 2]}, ttl=60)
+    assert b.get("a") == {"x": [1, 2]}
+    b.delete("a")
+    assert b.get("a") is None
+
+
+def test_get_many_set_many(make):
+    b = make()
+    b.set_many({"a": 1, "b": 2, "c": 3}, ttl=60)
+    assert b.get_many(["a", "c", "missing"]) == {"a": 1, "c": 3}
+    assert b.size() == 3
+
+
+def test_ttl_expiry(make):
+    b = make()
+    b.set("short", 1, ttl=0.05)
+    b.set("long", 2, ttl=60)
+    assert b.expires_at("short") <= time.time() + 0.05
+    time.sleep(0.1)
+    assert b.get_many(["short", "long"]) == {"long": 2}
+
+
+def test_entry_cap_evicts_least_recently_used(make, monkeypatch):
+    monkeypatch.setattr(cache_backends, "_TOUCH_INTERVAL", 0.0)
+    b = make(max_entries=3)
+    for key in ("a", "b", "c"):
+        b.set(key, key, ttl=60)
+        time.sleep(0.01)
+    assert b.get("a") == "a"  # "b" is now least recently used
+    time.sleep(0.01)
+    b.set("d", "d", ttl=60)
+    assert b.size() == 3
+    assert b.get_many(["a", "b", "c", "d"]) == {"a": "a", "c": "c", "d": "d"}
+
+
+def test_clear(make):
+    b = make()
+    b.set_many({"a": 1, "b": 2}, ttl=60)
+    assert b.clear() == 2
+    assert b.size() == 0
+
+
+def test_get_or_compute_runs_once(make):
+    b = make()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "v"
+
+    threads = [threading.Thread(target=b.get_or_compute, args=("k", compute, 60)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert b.get("k") == "v"
+
+
+def test_sqlite_namespaces_are_separate(tmp_path):
+    a = SQLiteBackend(str(tmp_path / "cache.db"), "a", 8)
+    b = SQLiteBackend(str(tmp_path / "cache.db"), "b", 8)
+    a.set("k", 1, ttl=60)
+    assert b.get("k") is None
+    assert b.clear() == 0
+    assert a.get("k") == 1
+
+
+def test_sqlite_lease_excludes_other_instance(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = SQLiteBackend(path, "ns", 8)
+    second = SQLiteBackend(path, "ns", 8, lease_seconds=5.0)
+    order = []
+
+    def other():
+        with second.lock("k") as held:
+            order.append(("second", held))
+
+    with first.lock("k") as held:
+        assert held is True
+        t = threading.Thread(target=other)
+        t.start()
+        time.sleep(0.2)
+        order.append(("first done", True))
+    t.join()
+    assert order == [("first done", True), ("second", True)]
+
+
+def test_sqlite_lock_reports_missing_lease_after_deadline(tmp_path):
+    path = str(tmp_path / "cache.db")
+    holder = SQLiteBackend(path, "ns", 8, lease_seconds=30.0)
+    waiter = SQLiteBackend(path, "ns", 8, lease_seconds=0.2)
+    assert holder._try_lease("k", "someone-else")
+    with waiter.lock("k") as held:
+        assert held is False
+    # the waiter must not release a lease it never held
+    assert not waiter._try_lease("k", "third")
+
+
+def test_sqlite_hit_is_read_only_when_recently_touched(tmp_path):
+    b = SQLiteBackend(str(tmp_path / "cache.db"), "ns", 8)
+    b.set("k", 1, ttl=60)
+    conn = b._conn()
+    before = conn.total_changes
+    assert b.get("k") == 1
+    assert conn.total_changes == before
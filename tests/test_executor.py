@@ -0,0 +1,99 @@
+# tests/test_executor.py
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import Core.executor as executor
+from Core.executor import LoopLagMonitor, run_cpu
+
+
+class FakePool:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(fn)
+        fut = Future()
+        fut.set_result(fn(*args))
+        return fut
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(executor, "_get_pool", lambda: fake)
+    monkeypatch.setattr(executor, "offload_stats", {"offloaded": 0, "inline": 0})
+    return fake
+
+
+def test_small_input_runs_inline(pool):
+    assert run_cpu(sum, [1, 2, 3], size=10, threshold=64) == 6
+    assert pool.submitted == []
+    assert executor.offload_stats == {"offloaded": 0, "inline": 1}
+
+
+def test_input_at_threshold_is_offloaded(pool):
+    assert run_cpu(sum, [1, 2, 3], size=64, threshold=64) == 6
+    assert pool.submitted == [sum]
+    assert executor.offload_stats == {"offloaded": 1, "inline": 0}
+
+
+def test_zero_threshold_disables_offload(pool):
+    run_cpu(sum, [1], size=10_000, threshold=0)
+    assert pool.submitted == []
+
+
+def test_no_pool_runs_inline(monkeypatch):
+    monkeypatch.setattr(executor, "CPU_POOL_WORKERS", 0)
+    monkeypatch.setattr(executor, "offload_stats", {"offloaded": 0, "inline": 0})
+    assert run_cpu(sum, [2, 3], size=100, threshold=1) == 5
+    assert executor.offload_stats == {"offloaded": 0, "inline": 1}
+
+
+def test_counters_are_exact_under_threads(pool):
+    threads = [
+        threading.Thread(target=lambda: [run_cpu(len, "ab", size=1, threshold=2) for _ in range(500)])
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert executor.offload_stats["inline"] == 4000
+
+
+def test_loop_lag_records_average_and_window_max():
+    mon = LoopLagMonitor(interval=0.01, window=60.0)
+    mon._record(10.0)
+    mon._record(0.0)
+    assert mon.last_ms == 0.0
+    assert mon.max_ms == 10.0
+    assert mon.avg_ms == pytest.approx(0.9 * 1.0)
+
+
+def test_loop_lag_window_resets_max():
+    mon = LoopLagMonitor(interval=0.01, window=0.0)
+    mon._record(50.0)
+    mon._record(5.0)
+    # each record closes a zero-length window, so the max follows recent lag
+    assert mon.max_ms == 5.0
+
+
+def test_loop_lag_measures_blocked_loop():
+    async def main():
+        mon = LoopLagMonitor(interval=0.01)
+        mon.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)  # block the loop
+        await asyncio.sleep(0.05)
+        await mon.stop()
+        return mon
+
+    mon = asyncio.run(main())
+    assert mon.max_ms >= 50
+    assert mon._task is None
+    stats = mon.stats()
+    assert set(stats) >= {"lag_last_ms", "lag_avg_ms", "lag_max_ms", "offloaded", "inline"}
@@ -0,0 +1,68 @@
+# tests/test_fused_graph.py
+import pytest
+from fastapi import HTTPException
+
+import API.rank_service as rank_service
+from API.rank_service import build_init_state, run_agent
+from API.schemas import RankRequest
+
+
+@pytest.fixture
+def fused(fake_agent, monkeypatch):
+    monkeypatch.setattr(rank_service, "agent_app", fake_agent.build_app("fused"))
+    return fake_agent
+
+
+def init_state(query="iphone 15 pro max 256", **extra):
+    state = build_init_state(RankRequest(query=query))
+    state.update(extra)
+    return state
+
+
+def test_fused_run_reaches_result(fused):
+    final = run_agent(init_state())
+    assert final["tried_tools"] == ["shopping_search", "normalize_batch", "product_page_fetch_batch"]
+    assert final["steps"] == 3
+    assert final["needs_more_info"] is False
+    items = final["result"]["items"]
+    assert items and all(it["link"].startswith("https://example.com/p/") for it in items)
+    assert items[0]["price"] == 4825.0  # cheapest offer with a stated "new" condition
+
+
+def test_fused_reducers_accumulate(fused, monkeypatch):
+    def fail_search(query, limit=40):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(fused, "cached_offers", fail_search)
+    final = run_agent(init_state(tried_tools=["earlier"], errors=["earlier error"]))
+    # operator.add appends each node's partial list to what the state already held
+    assert final["tried_tools"] == ["earlier", "shopping_search", "normalize_batch", "product_page_fetch_batch"]
+    assert final["errors"][:2] == ["earlier error", "shopping_search: upstream down"]
+
+
+def test_fused_needs_more_info_skips_run(fused, monkeypatch):
+    monkeypatch.setattr(fused, "analyze_intent", lambda q: {
+        "ready": False, "search_query": q, "follow_up_question": "Which storage size?",
+    })
+
+    def no_search(query, limit=40):
+        raise AssertionError("search must not run before the intent is ready")
+
+    monkeypatch.setattr(fused, "cached_offers", no_search)
+    final = run_agent(init_state(query="iphone"))
+    assert final["needs_more_info"] is True
+    assert final["tried_tools"] == []
+    assert "plan" not in final
+    assert final["result"] == {"items": [], "notes": "Which storage size?"}
+
+
+def test_fused_stop_between_steps(fused):
+    with pytest.raises(rank_service.RankCancelled):
+        run_agent(init_state(), should_stop=lambda: True)
+
+
+def test_fused_missing_result_is_500(fused, monkeypatch):
+    monkeypatch.setattr(rank_service, "agent_app", type("App", (), {"stream": lambda self, s, stream_mode: iter([])})())
+    with pytest.raises(HTTPException) as exc:
+        run_agent(init_state())
+    assert exc.value.status_code == 500
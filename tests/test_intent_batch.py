@@ -0,0 +1,137 @@
+# tests/test_intent_batch.py
+import json
+import threading
+
+import pytest
+
+import Agent.intent as intent
+from Agent.intent import INTENT_BATCH_SYSTEM_PROMPT, IntentBatcher
+from Core.cache_backends import MemoryLRUBackend
+from Core.llm import CompletionCache
+
+
+class FakeLLM:
+    """chat_json stand-in: answers single and batched intent prompts, or fails on demand."""
+
+    def __init__(self, drop_ids=(), batch_error=None, single_error=None):
+        self.calls = []
+        self.drop_ids = set(drop_ids)
+        self.batch_error = batch_error
+        self.single_error = single_error
+        self._lock = threading.Lock()
+
+    def __call__(self, system, user, model=None):
+        with self._lock:
+            self.calls.append("batch" if system == INTENT_BATCH_SYSTEM_PROMPT else "single")
+        if system == INTENT_BATCH_SYSTEM_PROMPT:
+            if self.batch_error is not None:
+                raise self.batch_error
+            requests = json.loads(user.split("\n\n")[0])["requests"]
+            return {"results": [
+                {"id": r["id"], "search_query": r["text"], "ready": True}
+                for r in requests if r["id"] not in self.drop_ids
+            ]}
+        if self.single_error is not None:
+            raise self.single_error
+        return {"search_query": user.splitlines()[1], "ready": True}
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    cache = CompletionCache(max_entries=64, ttl=60, persist_dir=None, backend=MemoryLRUBackend(64))
+    monkeypatch.setattr(intent, "completion_cache", cache)
+
+    def install(**kwargs):
+        fake = FakeLLM(**kwargs)
+        monkeypatch.setattr(intent, "chat_json", fake)
+        return fake
+
+    return install
+
+
+def run_concurrently(batcher, queries):
+    results, errors = {}, {}
+
+    def call(q):
+        try:
+            results[q] = batcher.submit(q)
+        except Exception as e:
+            errors[q] = e
+
+    threads = [threading.Thread(target=call, args=(q,)) for q in queries]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+QUERIES = ["iphone 15", "iphone 14", "iphone 13"]
+
+
+def test_concurrent_calls_share_one_request(llm):
+    fake = llm()
+    batcher = IntentBatcher(window_ms=1000, max_size=3)
+    results, errors = run_concurrently(batcher, QUERIES)
+    assert errors == {}
+    assert fake.calls == ["batch"]
+    assert {q: r["search_query"] for q, r in results.items()} == {q: q for q in QUERIES}
+
+
+def test_missing_result_falls_back_individually(llm):
+    fake = llm(drop_ids={"0", "2"})
+    batcher = IntentBatcher(window_ms=1000, max_size=3)
+    results, errors = run_concurrently(batcher, QUERIES)
+    assert errors == {}
+    assert sorted(fake.calls) == ["batch", "single", "single"]
+    assert batcher.stats()["fallbacks"] == 2
+    assert len(results) == 3
+
+
+def test_api_error_is_raised_not_retried(llm):
+    fake = llm(batch_error=TimeoutError("upstream timeout"))
+    batcher = IntentBatcher(window_ms=1000, max_size=3)
+    results, errors = run_concurrently(batcher, QUERIES)
+    assert results == {}
+    assert set(errors) == set(QUERIES)
+    assert all(isinstance(e, TimeoutError) for e in errors.values())
+    assert fake.calls == ["batch"]
+
+
+def test_unparseable_batch_falls_back(llm):
+    fake = llm(batch_error=ValueError("not JSON"))
+    batcher = IntentBatcher(window_ms=1000, max_size=3)
+    results, errors = run_concurrently(batcher, QUERIES)
+    assert errors == {}
+    assert sorted(fake.calls) == ["batch", "single", "single", "single"]
+
+
+def test_failed_single_call_is_not_repeated(llm):
+    fake = llm(single_error=TimeoutError("upstream timeout"))
+    batcher = IntentBatcher(window_ms=0, max_size=8)
+    with pytest.raises(TimeoutError):
+        batcher.submit("iphone 15")
+    assert fake.calls == ["single"]
+    assert batcher.stats()["fallbacks"] == 0
+
+
+def test_cache_miss_counted_once(llm, monkeypatch):
+    import Core.llm as llm_module
+
+    llm()
+    # single calls go through the real chat_json cache path with a fake client
+    monkeypatch.setattr(intent, "chat_json", llm_module.chat_json)
+    monkeypatch.setattr(llm_module, "completion_cache", intent.completion_cache)
+    monkeypatch.setattr(llm_module.limiter, "acquire", lambda *a, **kw: None)
+
+    class Resp:
+        choices = [type("C", (), {"message": type("M", (), {"content": '{"ready": true}'})()})()]
+        usage = None
+
+    monkeypatch.setattr(llm_module.client.chat.completions, "create", lambda **kw: Resp())
+    batcher = IntentBatcher(window_ms=0, max_size=8)
+    batcher.submit("iphone 15")
+    assert intent.completion_cache.stats()["misses"] == 1
+    batcher.submit("iphone 15")
+    stats = intent.completion_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
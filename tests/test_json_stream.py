@@ -0,0 +1,124 @@
+# tests/test_json_stream.py
+import json
+
+import pytest
+
+from Core.json_stream import iter_array_items, iter_decoded
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+DOC = {
+    "notes": "ok",
+    "items": [{"name": "a", "price": 1}, {"name": "b", "tags": ["x", "]"]}, 3, "s"],
+    "after": {"ignored": True},
+}
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_yields_items_for_any_chunking(size):
+    assert list(iter_array_items(chunked(json.dumps(DOC), size), "items")) == DOC["items"]
+
+
+def test_items_arrive_before_the_document_ends():
+    text = json.dumps(DOC)
+    cut = text.index('{"name": "b"')
+    consumed = []
+
+    def chunks():
+        for ch in text:
+            consumed.append(ch)
+            yield ch
+
+    it = iter_array_items(chunks(), "items")
+    assert next(it) == {"name": "a", "price": 1}
+    assert len(consumed) <= cut + 1
+
+
+def test_stops_reading_after_the_array():
+    def chunks():
+        yield '{"items": [1, 2]'
+        raise AssertionError("read past the target array")
+
+    assert list(iter_array_items(chunks(), "items")) == [1, 2]
+
+
+@pytest.mark.parametrize("doc", [{}, {"items": []}, {"other": [1]}])
+def test_missing_or_empty_array(doc):
+    assert list(iter_array_items([json.dumps(doc)], "items")) == []
+
+
+def test_non_list_value_under_key_is_skipped():
+    assert list(iter_array_items(['{"items": {"a": 1}, "x": 2}'], "items")) == []
+
+
+def test_truncated_stream_raises():
+    with pytest.raises(ValueError):
+        list(iter_array_items(['{"items": [{"a": 1}, {"b"'], "items"))
+
+
+def test_not_an_object_raises():
+    with pytest.raises(ValueError):
+        list(iter_array_items(["[1, 2]"], "items"))
+
+
+@pytest.mark.parametrize("number", ["1.5", "12e3", "-7", "1.25E-2"])
+def test_numbers_split_across_chunks(number):
+    text = '{"items": [' + number + ', 2]}'
+    expected = [json.loads(number), 2]
+    for cut in range(1, len(text)):
+        assert list(iter_array_items([text[:cut], text[cut:]], "items")) == expected
+
+
+def test_large_unrelated_section_is_skipped():
+    doc = {"filters": [{"k": i, "v": "x" * 50} for i in range(2000)], "items": [1, 2]}
+    assert list(iter_array_items(chunked(json.dumps(doc), 64), "items")) == [1, 2]
+
+
+def test_iter_decoded_keeps_multibyte_characters():
+    data = json.dumps({"items": ["ايفون ١٥"]}, ensure_ascii=False).encode("utf-8")
+    chunks = [data[i:i + 1] for i in range(len(data))]
+    assert list(iter_array_items(iter_decoded(chunks), "items")) == ["ايفون ١٥"]
+
+
+class _FakeResponse:
+    encoding = "utf-8"
+
+    def __init__(self, body: bytes, chunk: int):
+        self.body = body
+        self.chunk = chunk
+        self.read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=None):
+        for i in range(0, len(self.body), self.chunk):
+            self.read = i + self.chunk
+            yield self.body[i:i + self.chunk]
+
+
+def test_shopping_search_stops_after_limit_usable_offers(monkeypatch):
+    import Agent.tools as tools
+
+    results = [{"title": "no price", "product_link": "https://x/0"}] + [
+        {"title": f"iPhone {i}", "extracted_price": 4000 + i, "product_link": f"https://x/{i}", "seller": "Jarir"}
+        for i in range(1, 200)
+    ]
+    body = json.dumps({"search_metadata": {"id": "1"}, "shopping_results": results}).encode("utf-8")
+    response = _FakeResponse(body, 256)
+    monkeypatch.setattr(tools, "SEARCHAPI_KEY", "test")
+    monkeypatch.setattr(tools.requests, "get", lambda *a, **kw: response)
+    monkeypatch.setattr(tools.limiter, "acquire", lambda *a, **kw: None)
+
+    offers = tools.shopping_search("iphone", limit=5)
+    assert [o["name"] for o in offers] == [f"iPhone {i}" for i in range(1, 6)]
+    assert response.read < len(body) // 4
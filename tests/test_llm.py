@@ -0,0 +1,149 @@
+# tests/test_llm.py
+import threading
+import time
+
+import pytest
+
+import Core.llm as llm
+from Core.cache_backends import MemoryLRUBackend
+from Core.llm import CompletionCache
+
+
+def _ns(**kw):
+    return type("NS", (), kw)()
+
+
+class FakeCompletions:
+    """client.chat.completions stand-in that counts calls and answers slowly."""
+
+    def __init__(self, content='{"ok": true}', delay=0.05):
+        self.content = content
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if stream:
+            return iter([
+                _ns(choices=[_ns(delta=_ns(content=self.content[:5]))], usage=None),
+                _ns(choices=[_ns(delta=_ns(content=self.content[5:]))], usage=None),
+                _ns(choices=[], usage=_ns(total_tokens=7)),
+            ])
+        return _ns(choices=[_ns(message=_ns(content=self.content))], usage=_ns(total_tokens=7))
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    cache = CompletionCache(max_entries=16, ttl=60, persist_dir=None, backend=MemoryLRUBackend(16))
+    fake = FakeCompletions()
+    monkeypatch.setattr(llm, "completion_cache", cache)
+    monkeypatch.setattr(llm.limiter, "acquire", lambda *a, **kw: None)
+    monkeypatch.setattr(llm.client.chat, "completions", fake)
+    return fake
+
+
+def _concurrently(fn, n=6):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_chat_json_concurrent_misses_call_llm_once(fake_client):
+    results = _concurrently(lambda: llm.chat_json("sys", "same question"))
+    assert results == [{"ok": True}] * 6
+    assert fake_client.calls == 1
+
+
+def test_chat_json_stream_concurrent_misses_call_llm_once(fake_client):
+    results = _concurrently(lambda: "".join(llm.chat_json_stream("sys", "same question")))
+    assert results == ['{"ok": true}'] * 6
+    assert fake_client.calls == 1
+
+
+def test_chat_json_stream_releases_lock_when_closed(fake_client):
+    stream = llm.chat_json_stream("sys", "q")
+    next(stream)
+    stream.close()
+    # an abandoned stream is not cached, and does not block the next caller
+    assert "".join(llm.chat_json_stream("sys", "q")) == '{"ok": true}'
+    assert fake_client.calls == 2
+
+
+def make_cache(tmp_path=None, ttl=60, salt="v1", max_entries=16):
+    return CompletionCache(
+        max_entries=max_entries, ttl=ttl, salt=salt,
+        persist_dir=str(tmp_path) if tmp_path else None, backend=MemoryLRUBackend(max_entries),
+    )
+
+
+def test_salt_change_invalidates_keys():
+    old, new = make_cache(salt="v1"), make_cache(salt="v2")
+    assert old.key("m", "sys", "q") == make_cache(salt="v1").key("m", "sys", "q")
+    assert old.key("m", "sys", "q") != new.key("m", "sys", "q")
+
+
+def test_key_separates_fields():
+    cache = make_cache()
+    assert cache.key("m", "ab", "c") != cache.key("m", "a", "bc")
+
+
+def test_ttl_expiry():
+    cache = make_cache(ttl=0.05)
+    key = cache.key("m", "sys", "q")
+    cache.put(key, '{"a": 1}', tokens=3)
+    assert cache.get(key) == '{"a": 1}'
+    time.sleep(0.1)
+    assert cache.get(key) is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = make_cache(max_entries=0)
+    key = cache.key("m", "sys", "q")
+    cache.put(key, "{}")
+    assert cache.get(key) is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_persist_dir_round_trip(tmp_path):
+    writer = make_cache(tmp_path)
+    key = writer.key("m", "sys", "q")
+    writer.put(key, '{"a": 1}', tokens=11)
+
+    # a fresh process: empty backend, same directory
+    reader = make_cache(tmp_path)
+    assert reader.get(key) == '{"a": 1}'
+    assert reader.stats()["tokens_saved"] == 11
+    assert reader.backend.size() == 1
+
+
+def test_expired_file_is_not_restored(tmp_path):
+    writer = make_cache(tmp_path, ttl=0.05)
+    key = writer.key("m", "sys", "q")
+    writer.put(key, '{"a": 1}')
+    time.sleep(0.1)
+
+    reader = make_cache(tmp_path)
+    assert reader.get(key) is None
+    assert reader.backend.size() == 0
+
+
+def test_stats_accounting_and_peek():
+    cache = make_cache()
+    key = cache.key("m", "sys", "q")
+    assert cache.peek(key) is None
+    assert cache.get(key) is None
+    cache.put(key, "{}", tokens=5)
+    assert cache.peek(key) == "{}"
+    assert cache.get(key) == "{}"
+    assert cache.get(key) == "{}"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["tokens_saved"]) == (2, 1, 10)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+    assert stats["entries"] == 1
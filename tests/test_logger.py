@@ -0,0 +1,81 @@
+# tests/test_logger.py
+import json
+import logging
+import queue
+import sys
+
+import Core.logger as logger_module
+from Core.logger import (
+    JsonFormatter, _DeferredQueueHandler, _RequestIdFilter, dropped_records, request_id_var, should_sample_state,
+)
+
+
+def make_record(msg, args=(), exc_info=None):
+    return logging.LogRecord("salla.test", logging.INFO, __file__, 1, msg, args, exc_info)
+
+
+def test_json_formatter_merges_dict_messages():
+    record = make_record({"event": "rank.completed", "duration_ms": 12.5, "query": "ايفون"})
+    record.request_id = "abc"
+    out = json.loads(JsonFormatter().format(record))
+    assert out["event"] == "rank.completed"
+    assert out["duration_ms"] == 12.5
+    assert out["query"] == "ايفون"
+    assert (out["level"], out["logger"], out["request_id"]) == ("INFO", "salla.test", "abc")
+
+
+def test_json_formatter_plain_message_and_exception():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record("fetched %d offers", (3,), exc_info=sys.exc_info())
+    line = JsonFormatter().format(record)
+    assert "\n" not in line
+    out = json.loads(line)
+    assert out["message"] == "fetched 3 offers"
+    assert out["request_id"] is None
+    assert "ValueError: boom" in out["exc"]
+
+
+def test_request_id_is_stamped_from_context():
+    token = request_id_var.set("req-1")
+    try:
+        record = make_record("hello")
+        assert _RequestIdFilter().filter(record) is True
+    finally:
+        request_id_var.reset(token)
+    assert record.request_id == "req-1"
+    other = make_record("later")
+    _RequestIdFilter().filter(other)
+    assert other.request_id is None
+
+
+def test_should_sample_state_rate(monkeypatch):
+    monkeypatch.setattr(logger_module, "LOG_STATE_SAMPLE_RATE", 0.0)
+    assert not any(should_sample_state() for _ in range(100))
+    monkeypatch.setattr(logger_module, "LOG_STATE_SAMPLE_RATE", 1.0)
+    assert all(should_sample_state() for _ in range(100))
+    monkeypatch.setattr(logger_module, "LOG_STATE_SAMPLE_RATE", 0.5)
+    monkeypatch.setattr(logger_module.random, "random", lambda: 0.49)
+    assert should_sample_state() is True
+    monkeypatch.setattr(logger_module.random, "random", lambda: 0.5)
+    assert should_sample_state() is False
+
+
+def test_deferred_handler_drops_when_queue_full():
+    q = queue.Queue(maxsize=2)
+    handler = _DeferredQueueHandler(q)
+    log = logging.getLogger("salla.test.deferred")
+    log.propagate = False
+    log.addHandler(handler)
+    try:
+        before = dropped_records()
+        for i in range(5):
+            log.warning({"event": "test", "i": i})
+    finally:
+        log.removeHandler(handler)
+    assert q.qsize() == 2
+    assert dropped_records() == before + 3
+    # records are queued unformatted; the listener formats them
+    first = q.get_nowait()
+    assert first.msg == {"event": "test", "i": 0}
@@ -0,0 +1,70 @@
+# tests/test_normalizers.py
+import pytest
+
+from Agent.normalizers import canonical_query_key, canonicalize_query, normalize_query_text
+
+PRO_MAX_256 = "model:iphone-15-pro-max storage:256gb"
+
+
+@pytest.mark.parametrize("query", [
+    "iPhone 15 Pro Max 256GB",
+    "iphone15 promax 256 gb",
+    "IPHONE 15 PRO MAX, 256 GB!",
+    "ايفون 15 برو ماكس ٢٥٦ جيجا",
+    "آيفون ١٥ برو ماكس 256",
+])
+def test_equivalent_phrasings_share_a_key(query):
+    assert canonical_query_key(query) == PRO_MAX_256
+
+
+def test_canonicalize_extracts_model_and_storage():
+    canon = canonicalize_query("iphone15 promax 256 gb")
+    assert canon["model"] == "iPhone 15 Pro Max"
+    assert canon["storage"] == "256GB"
+    assert canon["text"] == "iphone 15 pro max 256gb"
+    assert canon["tokens"] == []
+
+
+def test_plus_sign_and_terabytes():
+    assert canonical_query_key("iPhone 15+ 128") == "model:iphone-15-plus storage:128gb"
+    assert canonical_query_key("iphone 15 pro 1tb") == "model:iphone-15-pro storage:1tb"
+
+
+def test_unknown_model_keeps_sorted_tokens():
+    canon = canonicalize_query("samsung s24 ultra 512gb")
+    assert canon["model"] is None
+    assert canon["storage"] == "512GB"
+    assert canon["key"] == "storage:512gb s24 samsung ultra"
+    # word order does not matter once the model is unknown
+    assert canonical_query_key("ultra samsung 512gb s24") == canon["key"]
+
+
+def test_different_products_differ():
+    assert canonical_query_key("iPhone 15 Pro 256GB") != canonical_query_key("iPhone 15 Pro Max 256GB")
+    assert canonical_query_key("iPhone 15 Pro 256GB") != canonical_query_key("iPhone 15 Pro 512GB")
+
+
+def test_normalize_query_text_keeps_short_alnum_tokens():
+    assert normalize_query_text("Galaxy S24 5G 6.7 inch") == "galaxy s24 5g 6.7in"
+
+
+def test_empty_query():
+    assert canonicalize_query("") == {"key": "", "text": "", "model": None, "storage": None, "tokens": []}
+
+
+def test_bare_g_means_gigabytes_only_for_storage_sizes():
+    assert canonical_query_key("iphone 15 pro max 256g") == PRO_MAX_256
+
+
+def test_extra_storage_tokens_stay_in_the_key():
+    canon = canonicalize_query("iphone 15 pro max 256 vs ٥١٢")
+    assert canon["storage"] == "256GB"
+    assert canon["tokens"] == ["512gb", "vs"]
+    assert canonical_query_key("iphone 15 pro max 256 vs 512") != canonical_query_key("iphone 15 pro max 256 vs")
+    # repeating the chosen storage adds nothing
+    assert canonical_query_key("iphone 15 pro max 256 256gb") == PRO_MAX_256
+
+
+def test_standalone_arabic_iphone_is_transliterated():
+    assert canonical_query_key("ايفون 16 برو") == canonical_query_key("iphone 16 pro") == "16 iphone pro"
+    assert canonical_query_key("آيفون 16 برو") == "16 iphone pro"
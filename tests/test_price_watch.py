@@ -0,0 +1,37 @@
+# tests/test_price_watch.py
+import Agent.price_watch as price_watch
+from Agent.price_watch import PriceWatchPoller, WatchStore
+
+
+def test_list_routes_require_user_id(client):
+    assert client.get("/watches").status_code == 422
+    assert client.get("/watches/alerts").status_code == 422
+
+
+def test_watches_are_scoped_to_user(client):
+    created = client.post("/watches", json={
+        "user_id": "alice", "query": "iPhone 15 Pro Max 256GB", "max_price_sar": 4500,
+    })
+    assert created.status_code == 201
+    watch_id = created.json()["id"]
+    assert [w["id"] for w in client.get("/watches", params={"user_id": "alice"}).json()] == [watch_id]
+    assert client.get("/watches", params={"user_id": "bob"}).json() == []
+    assert client.get("/watches/alerts", params={"user_id": "bob"}).json() == []
+    assert client.delete(f"/watches/{watch_id}").status_code == 422
+    assert client.delete(f"/watches/{watch_id}", params={"user_id": "bob"}).status_code == 404
+    assert client.delete(f"/watches/{watch_id}", params={"user_id": "alice"}).status_code == 204
+    assert client.get("/watches", params={"user_id": "alice"}).json() == []
+
+
+def test_one_cycle_per_interval_across_pollers(tmp_path, monkeypatch):
+    store = WatchStore(str(tmp_path / "watch.db"))
+    store.create("alice", "iPhone 15 Pro Max 256GB", 4500)
+    fetched = []
+    monkeypatch.setattr(price_watch.offer_cache, "get", lambda key: None)
+    monkeypatch.setattr(price_watch, "fetch_offers", lambda q: fetched.append(q) or [])
+
+    workers = [PriceWatchPoller(store, interval=60) for _ in range(3)]
+    results = [w.run_claimed_cycle() for w in workers]
+    assert sum(r is not None for r in results) == 1
+    assert fetched == ["iPhone 15 Pro Max 256GB"]
+    assert sum(w.skipped for w in workers) == 2
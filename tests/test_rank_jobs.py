@@ -0,0 +1,33 @@
+# tests/test_rank_jobs.py
+from API.rank_jobs import job_store, rank_jobs
+
+QUERY = {"query": "iPhone 15 Pro Max 256GB"}
+
+
+def test_submit_poll_and_cancel(client):
+    created = client.post("/rank/jobs", json=QUERY)
+    assert created.status_code == 202
+    job = created.json()
+    assert job["status"] == "queued"
+
+    assert client.get(f"/rank/jobs/{job['id']}").json()["status"] == "queued"
+    cancelled = client.post(f"/rank/jobs/{job['id']}/cancel")
+    assert cancelled.status_code == 200
+    assert cancelled.json()["status"] == "cancelled"
+    assert client.post(f"/rank/jobs/{job['id']}/cancel").status_code == 409
+
+
+def test_unknown_job(client):
+    assert client.get("/rank/jobs/does-not-exist").status_code == 404
+    assert client.post("/rank/jobs/does-not-exist/cancel").status_code == 404
+
+
+def test_claimed_job_runs_to_success(client):
+    job_id = client.post("/rank/jobs", json=QUERY).json()["id"]
+    # drain the queue on this thread instead of starting the worker pool
+    while (job := job_store.claim(rank_jobs.owner)) is not None:
+        rank_jobs._run(job)
+    done = client.get(f"/rank/jobs/{job_id}").json()
+    assert done["status"] == "succeeded"
+    assert done["result"]["query"] == QUERY["query"]
+    assert len(done["result"]["result"]["items"]) == 4
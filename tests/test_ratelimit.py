@@ -0,0 +1,61 @@
+# tests/test_ratelimit.py
+import threading
+import time
+
+import pytest
+
+from Core.ratelimit import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimitExceeded, TokenBucket
+
+
+def test_burst_then_shed():
+    bucket = TokenBucket("t", rate_per_sec=1.0, capacity=3, max_queue=10, max_wait=0.0)
+    for _ in range(3):
+        bucket.acquire()
+    with pytest.raises(RateLimitExceeded) as exc:
+        bucket.acquire()
+    assert exc.value.upstream == "t"
+    assert exc.value.retry_after >= 1
+    assert bucket.stats()["shed"] == 1
+
+
+def test_refills_over_time():
+    bucket = TokenBucket("t", rate_per_sec=50.0, capacity=1, max_queue=10, max_wait=0.0)
+    bucket.acquire()
+    time.sleep(0.05)
+    bucket.acquire()
+
+
+def test_waits_within_budget():
+    bucket = TokenBucket("t", rate_per_sec=20.0, capacity=1, max_queue=10, max_wait=1.0)
+    bucket.acquire()
+    started = time.monotonic()
+    bucket.acquire()
+    assert 0.02 <= time.monotonic() - started < 0.5
+
+
+def test_full_queue_sheds_immediately():
+    bucket = TokenBucket("t", rate_per_sec=0.5, capacity=1, max_queue=0, max_wait=10.0)
+    bucket.acquire()
+    started = time.monotonic()
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.1
+
+
+def test_interactive_served_before_batch():
+    bucket = TokenBucket("t", rate_per_sec=10.0, capacity=1, max_queue=10, max_wait=5.0)
+    bucket.acquire()
+    order = []
+
+    def take(prio, label):
+        bucket.acquire(prio)
+        order.append(label)
+
+    batch = threading.Thread(target=take, args=(PRIORITY_BATCH, "batch"))
+    batch.start()
+    time.sleep(0.01)  # batch is queued first
+    interactive = threading.Thread(target=take, args=(PRIORITY_INTERACTIVE, "interactive"))
+    interactive.start()
+    batch.join()
+    interactive.join()
+    assert order == ["interactive", "batch"]
@@ -0,0 +1,71 @@
+# tests/test_refresh.py
+import time
+
+import pytest
+
+import Agent.refresh as refresh
+from Agent.search_cache import OfferCache, PopularityTracker
+from Core.cache_backends import MemoryLRUBackend
+
+HALF_LIFE = 100
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    tracker = PopularityTracker(half_life=HALF_LIFE)
+    cache = OfferCache(max_entries=16, ttl=600, backend=MemoryLRUBackend(16))
+    fetched = []
+
+    def fake_fetch(query, limit=40):
+        fetched.append(query)
+        cache.put(query, query, [])
+        return []
+
+    monkeypatch.setattr(refresh, "popularity", tracker)
+    monkeypatch.setattr(refresh, "offer_cache", cache)
+    monkeypatch.setattr(refresh, "fetch_offers", fake_fetch)
+    sched = refresh.RefreshScheduler(top_n=5, budget_per_min=60, lead_seconds=60, min_score=0.5)
+    return sched, tracker, cache, fetched
+
+
+def age(tracker, key, seconds):
+    score, updated, query = tracker._scores[key]
+    tracker._scores[key] = (score, updated - seconds, query)
+
+
+def test_top_applies_score_floor():
+    tracker = PopularityTracker(half_life=HALF_LIFE)
+    tracker.record("old", "old")
+    tracker.record("new", "new")
+    age(tracker, "old", 3 * HALF_LIFE)
+    assert [k for k, _, _ in tracker.top(10)] == ["new", "old"]
+    assert [k for k, _, _ in tracker.top(10, min_score=0.5)] == ["new"]
+
+
+def test_query_seen_once_long_ago_is_not_refreshed(scheduler):
+    sched, tracker, _, _ = scheduler
+    tracker.record("q", "q")
+    age(tracker, "q", 2 * HALF_LIFE)
+    assert sched.pick() is None
+
+
+def test_recent_query_missing_from_cache_is_picked(scheduler):
+    sched, tracker, _, _ = scheduler
+    tracker.record("q", "q")
+    assert sched.pick() == ("q", "q")
+
+
+def test_fresh_entry_is_not_picked(scheduler):
+    sched, tracker, cache, _ = scheduler
+    tracker.record("q", "q")
+    cache.put("q", "q", [])
+    assert sched.pick() is None
+
+
+def test_refresh_skips_key_refreshed_meanwhile(scheduler):
+    sched, tracker, cache, fetched = scheduler
+    tracker.record("q", "q")
+    assert sched._refresh("q", "q") is True
+    assert sched._refresh("q", "q") is False
+    assert fetched == ["q"]
+    assert cache.expires_at("q") > time.time()
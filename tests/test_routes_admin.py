@@ -0,0 +1,63 @@
+# tests/test_routes_admin.py
+import os
+
+import API.routes_admin as routes_admin
+from API.response_cache import response_cache
+from Core.config import PROFILE_DIR
+from Core.profiling import profile_request
+
+
+def test_admin_routes_closed_without_token(client, monkeypatch):
+    monkeypatch.setattr(routes_admin, "ADMIN_TOKEN", None)
+    assert client.get("/admin/profiles").status_code == 403
+    assert client.delete("/admin/rank-cache", headers={"X-Admin-Token": "anything"}).status_code == 403
+
+
+def test_admin_routes_require_matching_token(client, monkeypatch):
+    monkeypatch.setattr(routes_admin, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    r = client.delete("/admin/rank-cache", headers={"X-Admin-Token": "s3cret"})
+    assert r.status_code == 200
+    assert "purged" in r.json()
+
+
+def _profiles():
+    return set(os.listdir(PROFILE_DIR)) if os.path.isdir(PROFILE_DIR) else set()
+
+
+def test_profile_header_ignored_without_token(client, monkeypatch):
+    monkeypatch.setattr(routes_admin, "ADMIN_TOKEN", None)
+    before = _profiles()
+    r = client.post("/rank", json={"query": "iPhone 15 Pro Max 256GB"}, headers={"X-Profile": "1"})
+    assert r.status_code == 200
+    assert _profiles() == before
+
+
+def test_profile_header_with_token_profiles_request(client, monkeypatch):
+    monkeypatch.setattr(routes_admin, "ADMIN_TOKEN", "s3cret")
+    r = client.post("/rank", json={"query": "iPhone 15 Pro Max 256GB"}, headers={"X-Profile": "s3cret"})
+    assert r.status_code == 200
+    assert r.headers["X-Request-ID"] in _profiles()
+
+
+def test_only_one_profile_at_a_time():
+    with profile_request("outer-profile") as outer:
+        with profile_request("inner-profile") as inner:
+            pass
+    assert (outer, inner) == (True, False)
+    assert "outer-profile" in _profiles()
+    assert "inner-profile" not in _profiles()
+    with profile_request("next-profile") as again:
+        pass
+    assert again is True
+
+
+def test_cached_rank_hit_is_not_profiled(client, monkeypatch):
+    monkeypatch.setattr(routes_admin, "ADMIN_TOKEN", "s3cret")
+    body = {"query": "iPhone 15 Pro 128GB"}
+    client.post("/rank", json=body)
+    hits = response_cache.stats()["hits"]
+    r = client.post("/rank", json=body, headers={"X-Profile": "s3cret"})
+    assert r.status_code == 200
+    assert response_cache.stats()["hits"] == hits + 1
+    assert r.headers["X-Request-ID"] not in _profiles()
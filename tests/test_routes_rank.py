@@ -0,0 +1,49 @@
+# tests/test_routes_rank.py
+import json
+
+
+def test_post_rank_has_no_http_caching_headers(client):
+    r = client.post("/rank", json={"query": "iPhone 15 Pro Max 256GB"})
+    assert r.status_code == 200
+    assert len(r.json()["result"]["items"]) == 4
+    assert "cache-control" not in r.headers
+
+
+def test_get_rank_etag_and_304(client):
+    r = client.get("/rank", params={"query": "iPhone 15 Pro Max 256GB"})
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"].startswith("public, max-age=")
+
+    again = client.get("/rank", params={"query": "iPhone 15 Pro Max 256GB"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_cached_body_echoes_each_callers_query(client):
+    first = client.get("/rank", params={"query": "iPhone 15 Pro Max 256GB"})
+    other = client.get("/rank", params={"query": "iphone15 promax 256 gb"})
+    assert first.json()["query"] == "iPhone 15 Pro Max 256GB"
+    assert other.json()["query"] == "iphone15 promax 256 gb"
+    assert first.json()["result"] == other.json()["result"]
+    assert first.headers["etag"] != other.headers["etag"]
+
+
+def test_post_and_get_return_the_same_response(client):
+    posted = client.post("/rank", json={"query": "iPhone 15 Pro Max 256GB"}).json()
+    got = client.get("/rank", params={"query": "iPhone 15 Pro Max 256GB"}).json()
+    assert posted == got
+
+
+def test_rank_stream_ends_with_result(client):
+    r = client.post("/rank/stream", json={"query": "iPhone 15 Pro Max 256GB"})
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[-1]["event"] == "result"
+    assert lines[-1]["response"]["query"] == "iPhone 15 Pro Max 256GB"
+
+
+def test_debug_query_key(client):
+    r = client.get("/rank/debug/query-key", params={"q": "ايفون 15 برو ماكس ٢٥٦"})
+    assert r.status_code == 200
+    assert r.json()["key"] == "model:iphone-15-pro-max storage:256gb"
@@ -0,0 +1,200 @@
+# tests/test_selection.py
+from typing import Any, Dict
+
+import Agent.graph as graph
+from Agent.selection import page_fetch_urls, pareto_prune
+
+MODEL = "iPhone 15 Pro Max"
+STORAGE = "256GB"
+
+
+def offer(name: str, price: float, condition: str = "New", retailer: str = "Jarir",
+          model: str = MODEL, storage: str = STORAGE) -> Dict[str, Any]:
+    return {
+        "name": name, "price_sar": price, "currency": "SAR", "retailer": retailer,
+        "condition": condition, "model": model, "storage": storage,
+        "link": f"https://example.com/{name.replace(' ', '-')}",
+    }
+
+
+def names(offers):
+    return sorted(o["name"] for o in offers)
+
+
+def test_cheaper_and_better_offer_drops_the_other():
+    a = offer("a", 4000)
+    b = offer("b", 4800)
+    frontier, near = pareto_prune([b, a], MODEL, STORAGE, near_pct=5)
+    assert names(frontier) == ["a"]
+    assert near == []
+
+
+def test_trade_off_keeps_both():
+    new = offer("new", 4800)
+    used = offer("used", 3500, condition="Used")
+    frontier, near = pareto_prune([new, used], MODEL, STORAGE)
+    assert names(frontier) == ["new", "used"]
+
+
+def test_exact_tie_keeps_both():
+    a = offer("a", 4000)
+    b = offer("b", 4000)
+    frontier, _ = pareto_prune([a, b], MODEL, STORAGE)
+    assert names(frontier) == ["a", "b"]
+
+
+def test_equal_price_worse_condition_is_dominated():
+    new = offer("new", 4000)
+    refurb = offer("refurb", 4000, condition="Refurbished")
+    frontier, near = pareto_prune([refurb, new], MODEL, STORAGE, near_pct=0)
+    assert names(frontier) == ["new"]
+    # equal price is within any band, including 0%
+    assert names(near) == ["refurb"]
+
+
+def test_near_frontier_band():
+    best = offer("best", 1000)
+    close = offer("close", 1040)
+    edge = offer("edge", 1050)
+    far = offer("far", 1200)
+    frontier, near = pareto_prune([far, edge, close, best], MODEL, STORAGE, near_pct=5)
+    assert names(frontier) == ["best"]
+    assert names(near) == ["close", "edge"]
+
+
+def test_must_have_coverage_is_a_dimension():
+    plain = offer("iphone", 4000)
+    titanium = offer("iphone titanium", 4100)
+    frontier, _ = pareto_prune([plain, titanium], MODEL, STORAGE, must_have=["titanium"], near_pct=0)
+    assert names(frontier) == ["iphone", "iphone titanium"]
+
+
+def test_accessory_never_prunes_the_product():
+    case = offer("iPhone 15 Pro Max Silicone Case", 79, storage=None)
+    phone = offer("iPhone 15 Pro Max 256GB", 4999)
+    frontier, near = pareto_prune([case, phone], MODEL, STORAGE, near_pct=0)
+    assert names(frontier) == names([case, phone])
+    assert near == []
+
+
+def test_other_storage_is_not_compared():
+    small = offer("128", 3800, storage="128GB")
+    asked = offer("256", 4500)
+    frontier, _ = pareto_prune([small, asked], MODEL, STORAGE, near_pct=0)
+    assert names(frontier) == ["128", "256"]
+
+
+def test_unknown_condition_is_not_ranked_worst():
+    refurb = offer("refurb", 3900, condition="Refurbished")
+    unlabelled = offer("unlabelled", 4500, condition="Unknown")
+    frontier, _ = pareto_prune([refurb, unlabelled], MODEL, STORAGE, near_pct=0)
+    assert names(frontier) == ["refurb", "unlabelled"]
+
+
+def test_no_model_in_query_prunes_nothing():
+    a = offer("a", 4000)
+    b = offer("b", 4800)
+    frontier, _ = pareto_prune([a, b], None, None, near_pct=0)
+    assert names(frontier) == ["a", "b"]
+
+
+def test_dominated_offers_outside_band_are_dropped():
+    offers = [offer(f"o{i}", 1000 + 100 * i) for i in range(6)]
+    frontier, near = pareto_prune(offers, MODEL, STORAGE, near_pct=0)
+    assert names(frontier) == ["o0"]
+    assert near == []
+
+
+def _finish(monkeypatch, offers):
+    calls = []
+
+    def fake_rank(pool, q, intent, trusted_only=False, top_k=4):
+        calls.append(pool)
+        return {"items": [{"name": o["name"]} for o in pool[:top_k]], "notes": None}
+
+    monkeypatch.setattr(graph, "llm_rank_offers", fake_rank)
+    state = {
+        "query": "iPhone 15 Pro Max 256GB", "search_query": "iPhone 15 Pro Max 256GB",
+        "offers": offers, "trusted_only": True, "errors": [],
+        "intent": {"ready": True, "category": "", "must_have": []},
+    }
+    return graph.finisher(state)["result"], calls
+
+
+def test_finisher_ranks_product_not_accessory(monkeypatch):
+    offers = [
+        offer("iPhone 15 Pro Max Silicone Case", 79, storage=None),
+        offer("iPhone 15 Pro Max 256GB refurbished", 3900, condition="Refurbished"),
+        offer("iPhone 15 Pro Max 256GB", 4999, condition="Unknown"),
+        offer("iPhone 15 Pro Max 256GB Blue", 5100, condition="Unknown"),
+    ]
+    result, calls = _finish(monkeypatch, offers)
+    assert len(calls) == 1
+    assert len(result["items"]) == 4
+
+
+def test_finisher_skips_llm_when_one_offer_dominates(monkeypatch):
+    offers = [
+        offer("iPhone 15 Pro Max 256GB", 4500),
+        offer("iPhone 15 Pro Max 256GB refurbished", 4600, condition="Refurbished"),
+        offer("iPhone 15 Pro Max 256GB used", 4700, condition="Used", retailer="Some Shop"),
+        offer("iPhone 15 Pro Max 256GB again", 5400),
+    ]
+    result, calls = _finish(monkeypatch, offers)
+    assert calls == []
+    assert [it["name"] for it in result["items"]] == ["iPhone 15 Pro Max 256GB"]
+
+
+def test_finisher_sends_only_frontier_and_near_to_llm(monkeypatch):
+    offers = [
+        offer("new 256GB", 4800),
+        offer("used 256GB", 3500, condition="Used"),
+        offer("new 256GB pricey", 6000),
+    ]
+    _, calls = _finish(monkeypatch, offers)
+    assert [names(pool) for pool in calls] == [["new 256GB", "used 256GB"]]
+
+
+def test_finisher_skips_llm_for_single_relevant_offer(monkeypatch):
+    result, calls = _finish(monkeypatch, [offer("iPhone 15 Pro Max 256GB", 4999)])
+    assert calls == []
+    assert [it["name"] for it in result["items"]] == ["iPhone 15 Pro Max 256GB"]
+
+
+def test_page_fetch_skips_offers_that_have_specs():
+    full = offer("full", 4000)
+    bare = offer("bare", 4100, model=None, storage=None)
+    assert page_fetch_urls([full, bare]) == [bare["link"]]
+
+
+def test_page_fetch_trusted_only_skips_untrusted():
+    trusted = offer("trusted", 4100, model=None)
+    untrusted = offer("untrusted", 4000, model=None, retailer="Some Shop")
+    assert page_fetch_urls([trusted, untrusted]) == [trusted["link"], untrusted["link"]]
+    assert page_fetch_urls([trusted, untrusted], trusted_only=True) == [trusted["link"]]
+
+
+def test_page_fetch_uses_finisher_filter():
+    case = offer("iPhone 15 Pro Max case", 79, model=None)
+    phone = offer("iPhone 15 Pro Max 256GB", 4800, model=None)
+    over_budget = offer("iPhone 15 Pro Max 256GB plus", 6000, model=None)
+    intent = {"must_have": ["256GB"], "budget_max": 5000}
+    assert page_fetch_urls([case, phone, over_budget], intent) == [phone["link"]]
+
+
+def test_page_fetch_respects_cap():
+    offers = [offer(f"bare {i}", 4000 + i, storage=None) for i in range(10)]
+    assert page_fetch_urls(offers, limit=2) == [offers[0]["link"], offers[1]["link"]]
+
+
+def test_planner_adds_no_fetch_step_when_nothing_to_fetch():
+    state = {
+        "query": "iphone 15 pro max 256",
+        "intent": {"ready": True},
+        "offers": [offer("full", 4000)],
+        "tried_tools": ["shopping_search", "spec_normalizer_batch"],
+        "steps": 2,
+    }
+    out = graph.planner(state)
+    assert out.get("next_tool", {}).get("name") != "product_page_fetch_batch"
+    assert out["done"] is True